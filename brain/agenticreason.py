@@ -2,42 +2,37 @@
 import os
 import json
 import logging
-from openai import OpenAI as Client
-from .conversation_manager import ConversationManager
-from .memory_handler import MemoryHandler
+from .ai_memory import get_conversation_manager
+from .openrouter_client import get_openrouter_client
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 class AgenticReasoner:
-    def __init__(self, api_key, model_name="gpt-4"):
+    def __init__(self, api_key, model_name="gpt-4", conversation_manager=None):
         """
         Initialize the Agentic Reasoner with an API key and model name.
+        It works on the shared ConversationManager unless one is passed in.
         """
         self.OPEN_ROUTER_API_KEY = api_key
         self.MODEL_NAME = model_name
-        self.client = Client(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=self.OPEN_ROUTER_API_KEY,
-        )
-        self.conversation_manager = ConversationManager()
-        self.memory_handler = MemoryHandler(self.conversation_manager.memory_dir)
+        self.client = get_openrouter_client()
+        self.client.set_api_key(self.OPEN_ROUTER_API_KEY)
+        self.conversation_manager = conversation_manager or get_conversation_manager()
         self.role = None  # Initialize role as None, to be set dynamically
         logging.info("Agentic Reasoner initialized.")
 
+    @property
+    def memory_handler(self):
+        # Follows the conversation manager, which replaces its handler for each new conversation
+        return self.conversation_manager.memory_handler
+
     def process_query(self, user_message):
         """
         Process the user query and generate a response using the AI model.
         """
-        # Retrieve previous conversations for context
-        previous_conversations = self.conversation_manager.get_previous_conversations()
-        context_messages = [{"role": "system", "content": "You are an AI assistant."}]
-        for conv in previous_conversations:
-            context_messages.append({"role": "user", "content": conv["user_message"]})
-            context_messages.append({"role": "assistant", "content": conv["ai_response"]})
-
-        # Add the current user message
-        context_messages.append({"role": "user", "content": user_message})
+        # Retrieve previous conversations and the current message, within the model's token budget
+        context_messages = self.conversation_manager.build_context_messages(user_message)
 
         # Retrieve the last agentic role from the database
         agentic_role = self.conversation_manager.get_last_agentic_role()
@@ -46,10 +41,9 @@ class AgenticReasoner:
 
         # Generate a response from the AI model
         try:
-            completion = self.client.chat.completions.create(
+            completion = self.client.chat_completion(
                 model=self.MODEL_NAME,
                 messages=context_messages,
-                extra_headers={"HTTP-Referer": "your_site_url", "X-Title": "your_app_name"}
             )
             if completion.choices and completion.choices[0].message:
                 response_message = completion.choices[0].message.content
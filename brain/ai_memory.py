@@ -1,17 +1,27 @@
-import os
-import datetime
-import numpy as np
-import csv
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
-from openai import OpenAI as Client
-from gensim.models import Word2Vec
-from gensim.utils import simple_preprocess
-import sqlite3
-from .memory_handler import MemoryHandler
-from .conversation_manager import ConversationManager
+import logging
+import threading
 
-conversation_manager = ConversationManager()
+# The ConversationManager is created on first use rather than at import, so importing
+# this module stays cheap and every caller shares the same instance
+_conversation_manager = None
+_conversation_manager_lock = threading.Lock()
+
+def get_conversation_manager():
+    """
+    Return the shared ConversationManager, creating it on first use.
+    """
+    global _conversation_manager
+    with _conversation_manager_lock:
+        if _conversation_manager is None:
+            from .conversation_manager import ConversationManager
+            _conversation_manager = ConversationManager()
+        return _conversation_manager
+
+def __getattr__(name):
+    # Keeps "from brain.ai_memory import conversation_manager" working
+    if name == "conversation_manager":
+        return get_conversation_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def process_response_with_word2vec(self, response):
     """
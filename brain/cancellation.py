@@ -0,0 +1,72 @@
+import time
+import threading
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+class RequestCancelled(Exception):
+    """
+    Raised inside a worker when the request it is serving has been cancelled.
+    """
+
+class CancelToken:
+    def __init__(self):
+        """
+        Cancellation signal for one in-flight model request.
+
+        The UI thread calls cancel() and returns at once. The worker polls the token between
+        steps and registers callbacks (such as closing the HTTP stream) that abort a blocking
+        call in progress. Callbacks run on a short-lived thread so cancel() never blocks.
+        """
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.callbacks = []
+        self.cancelled_at = None
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def cancel(self):
+        """
+        Signal cancellation and run the registered abort callbacks in the background.
+        """
+        with self.lock:
+            if self.event.is_set():
+                return
+            self.cancelled_at = time.perf_counter()
+            self.event.set()
+            callbacks, self.callbacks = self.callbacks, []
+        if callbacks:
+            threading.Thread(target=self._run_callbacks, args=(callbacks,), name="cancel-request", daemon=True).start()
+
+    def on_cancel(self, callback):
+        """
+        Register a callback that aborts the current blocking call.
+        It runs right away (on this thread) if the token is already cancelled.
+        """
+        with self.lock:
+            if not self.event.is_set():
+                self.callbacks.append(callback)
+                return
+        self._run_callbacks([callback])
+
+    def raise_if_cancelled(self):
+        if self.event.is_set():
+            raise RequestCancelled()
+
+    def latency(self):
+        """
+        Seconds since cancel() was called, or None if the token was not cancelled.
+        """
+        if self.cancelled_at is None:
+            return None
+        return time.perf_counter() - self.cancelled_at
+
+    def _run_callbacks(self, callbacks):
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logging.debug(f"Error while aborting a cancelled request: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,115 @@
+import time
+import logging
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+MESSAGE_OVERHEAD_TOKENS = 4  # Role and separator tokens added per chat message
+
+class TokenCounter:
+    def __init__(self, encoding_name="cl100k_base"):
+        """
+        Count tokens with tiktoken when it is installed, otherwise estimate ~4 characters per token.
+        """
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.get_encoding(encoding_name)
+            except Exception as e:
+                logging.warning(f"Falling back to estimated token counts: {str(e)}")
+
+    def count(self, text):
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return (len(text) + 3) // 4
+
+    def count_message(self, text):
+        return self.count(text) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ContextAssembler:
+    def __init__(self, token_counter, context_tokens=8192, response_reserve_tokens=1024):
+        """
+        Assemble prompt messages within a token budget.
+
+        Candidates are admitted by priority: the system prompt, the current message, the
+        recent turns (newest first), excerpts of uploaded documents (best match first) and
+        then the retrieved memories (best match first). Whatever does not fit is dropped
+        and reported.
+        """
+        self.token_counter = token_counter
+        self.context_tokens = context_tokens
+        self.response_reserve_tokens = response_reserve_tokens
+
+    @property
+    def budget(self):
+        return max(0, self.context_tokens - self.response_reserve_tokens)
+
+    def assemble(self, system_prompt, user_message, recent_rows, retrieved_rows, document_rows=()):
+        """
+        Build the message list for a request.
+
+        recent_rows, retrieved_rows and document_rows are (id, content, token_count) tuples;
+        recent rows are oldest first, the others best match first. token_count already
+        includes the per-message overhead.
+
+        Returns:
+            tuple: (messages, report) where report is a dict describing the assembly.
+        """
+        start = time.perf_counter()
+        budget = self.budget
+        used = self.token_counter.count_message(system_prompt) + self.token_counter.count_message(user_message)
+
+        # Recent turns stay contiguous: once one does not fit, all older ones are dropped too
+        kept_recent, dropped_recent, used = self._admit(reversed(recent_rows), budget, used, contiguous=True)
+        kept_documents, dropped_documents, used = self._admit(document_rows, budget, used, contiguous=False)
+        kept_retrieved, dropped_retrieved, used = self._admit(retrieved_rows, budget, used, contiguous=False)
+
+        # Document excerpts go first in document order, then memories in chronological order,
+        # then recent turns, then the current message
+        kept_documents.sort(key=lambda row: row[0])
+        kept_retrieved.sort(key=lambda row: row[0])
+        kept_recent.sort(key=lambda row: row[0])
+        messages = [{"role": "system", "content": system_prompt}]
+        messages.extend({"role": "user", "content": content} for _, content, _ in kept_documents + kept_retrieved + kept_recent)
+        messages.append({"role": "user", "content": user_message})
+
+        report = {
+            "budget": budget,
+            "used": used,
+            "recent_included": len(kept_recent),
+            "recent_dropped": dropped_recent,
+            "retrieved_included": len(kept_retrieved),
+            "retrieved_dropped": dropped_retrieved,
+            "documents_included": len(kept_documents),
+            "documents_dropped": dropped_documents,
+            "overflow_tokens": max(0, used - budget),
+            "elapsed_ms": 1000 * (time.perf_counter() - start),
+        }
+        if report["overflow_tokens"]:
+            logging.warning(f"System prompt and current message exceed the context budget by {report['overflow_tokens']} tokens.")
+        if dropped_recent or dropped_retrieved or dropped_documents:
+            logging.info(
+                f"Context budget reached: dropped {dropped_recent} recent turns, {dropped_documents} document excerpts "
+                f"and {dropped_retrieved} memories."
+            )
+        return messages, report
+
+    @staticmethod
+    def _admit(rows, budget, used, contiguous):
+        kept = []
+        dropped = 0
+        for row in rows:
+            if used + row[2] <= budget and not (contiguous and dropped):
+                kept.append(row)
+                used += row[2]
+            else:
+                dropped += 1
+        return kept, dropped, used
\ No newline at end of file
@@ -1,41 +1,94 @@
 import os
 import datetime
-import sqlite3
 import logging
 import json
+import time
+import threading
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from openai import OpenAI as Client
 from .memory_handler import MemoryHandler
+from .conversation_store import ConversationStore
+from .memory_index import MemoryIndex
+from .context_assembler import TokenCounter, ContextAssembler
 from .file_picker import FilePicker
+from .cancellation import RequestCancelled
+from .openrouter_client import get_openrouter_client
+from .response_cache import ResponseCache
+from .ingestion_cache import IngestionCache
+from .rolling_summary import RollingSummary
 
 logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
 
+SYSTEM_PROMPT = "You are an AI assistant."
+
 class ConversationManager:
     def __init__(self):
         self.memory_dir = os.path.join(os.path.dirname(__file__), "Memory")
         os.makedirs(self.memory_dir, exist_ok=True)
         self.conv_folder = None
         self.db_path = None
+        self.store = None
+        self.config = self._load_config()
         self.MODEL_NAME = self._load_model_name()
+        self.stream_responses = self.config.get("STREAM_RESPONSES", True)
+        self.last_time_to_first_token = None
+        self.retrieval_mode = self.config.get("RETRIEVAL_MODE", True)
+        self.retrieval_top_k = self.config.get("RETRIEVAL_TOP_K", 5)
+        self.retrieval_recent_turns = self.config.get("RETRIEVAL_RECENT_TURNS", 4)
+        self.retrieval_min_similarity = self.config.get("RETRIEVAL_MIN_SIMILARITY", 0.3)
+        self.memory_index = MemoryIndex()
+        self.dedupe_mode = self.config.get("MEMORY_DEDUPE", True)
+        self.dedupe_similarity = self.config.get("MEMORY_DEDUPE_SIMILARITY", 0.95)
+        self.document_top_k = self.config.get("DOCUMENT_RETRIEVAL_TOP_K", 6)
+        self.document_min_similarity = self.config.get("DOCUMENT_RETRIEVAL_MIN_SIMILARITY", 0.1)
+        self.chunk_index = MemoryIndex()  # Embeddings of the uploaded documents' chunks
+        self.rolling_summary = None
+        if self.config.get("ROLLING_SUMMARY_MODE", True):
+            self.rolling_summary = RollingSummary(
+                self,
+                fold_threshold=self.config.get("ROLLING_SUMMARY_FOLD_TURNS", 8),
+                keep_recent=self.config.get("ROLLING_SUMMARY_KEEP_RECENT", 4),
+                fan_in=self.config.get("ROLLING_SUMMARY_FAN_IN", 4),
+            )
+        self.token_counter = TokenCounter()
+        self.context_assembler = ContextAssembler(self.token_counter)
+        self.last_context_report = None
         self.OPEN_ROUTER_API_KEY = None
         self.client = None
-        self.memory_handler = MemoryHandler(self.memory_dir)
+        self.response_cache = None
+        if self.config.get("RESPONSE_CACHE", True):
+            self.response_cache = ResponseCache(
+                os.path.join(self.memory_dir, "response_cache.db"),
+                ttl_seconds=self.config.get("RESPONSE_CACHE_TTL_SECONDS", 86400),
+                max_entries=self.config.get("RESPONSE_CACHE_MAX_ENTRIES", 2000),
+            )
+        self.ingestion_cache = None
+        if self.config.get("INGESTION_CACHE", True):
+            self.ingestion_cache = IngestionCache(
+                os.path.join(self.memory_dir, "ingestion_cache.db"),
+                max_documents=self.config.get("INGESTION_CACHE_MAX_DOCUMENTS", 200),
+            )
+        self.base_vectors_path = self.config.get("BASE_VECTORS_PATH") or os.path.join(self.memory_dir, "base_vectors.kv")
+        self.memory_handler = None
         self.file_picker = FilePicker(self)  # Initialize FilePicker
         self.chatbot_ui = None
-        self.file_chunks = []  # Store file chunks in memory
-        self.file_ids = {}
+        self.folder_watcher = None
+        self.update_context_budget()
         self.init_conversation()
 
-    def _load_model_name(self):
+    def _load_config(self):
         config_path = os.path.join(os.path.dirname(__file__), "..", "config.json")
         try:
             with open(config_path, "r", encoding="utf-8") as config_file:
-                config = json.load(config_file)
-                return config["MODEL_NAME"]
+                return json.load(config_file)
         except Exception as e:
-            logging.error(f"Failed to load MODEL_NAME from config.json: {str(e)}")
+            logging.error(f"Failed to load config.json: {str(e)}")
+            return {}
+
+    def _load_model_name(self):
+        if "MODEL_NAME" not in self.config:
+            logging.error("Failed to load MODEL_NAME from config.json.")
             raise ValueError("MODEL_NAME must be defined in config.json")
+        return self.config["MODEL_NAME"]
 
     def set_openrouter_api_key(self, api_key):
         """
@@ -49,103 +102,412 @@ class ConversationManager:
         Set the model name and update the client.
         """
         self.MODEL_NAME = model_name
+        self.update_context_budget()
         self.update_client()
 
+    def update_context_budget(self):
+        """
+        Size the prompt budget for the current model from MODEL_CONTEXT_TOKENS in config.json.
+        """
+        context_sizes = self.config.get("MODEL_CONTEXT_TOKENS", {})
+        self.context_assembler.context_tokens = context_sizes.get(self.MODEL_NAME, context_sizes.get("default", 8192))
+        self.context_assembler.response_reserve_tokens = self.config.get("RESPONSE_RESERVE_TOKENS", 1024)
+
     def update_client(self):
         """
         Update the OpenAI client with the current API key and model name.
         """
         if self.MODEL_NAME and self.OPEN_ROUTER_API_KEY:
-            self.client = Client(
-                base_url="https://openrouter.ai/api/v1",
-                api_key=self.OPEN_ROUTER_API_KEY,
-            )
+            self.client = self.get_client()
             logging.info("OpenAI client updated with new API key and model name.")
 
+    def get_client(self):
+        """
+        Return the shared OpenRouter client with this manager's API key and response cache.
+        The openai package is only imported once the first request is made.
+        """
+        if not (self.MODEL_NAME and self.OPEN_ROUTER_API_KEY):
+            return None
+        client = get_openrouter_client(
+            max_concurrency=self.config.get("OPENROUTER_MAX_CONCURRENCY", 8),
+            max_connections=self.config.get("OPENROUTER_MAX_CONNECTIONS", 16),
+            timeout_seconds=self.config.get("OPENROUTER_TIMEOUT_SECONDS", 120),
+            connect_timeout_seconds=self.config.get("OPENROUTER_CONNECT_TIMEOUT_SECONDS", 10),
+        )
+        # Attached explicitly: the client may already have been created by another caller
+        client.cache = self.response_cache
+        client.set_api_key(self.OPEN_ROUTER_API_KEY)
+        return client
+
+    def preload(self):
+        """
+        Load the word vectors and the API client ahead of the first message.
+        """
+        try:
+            start = time.perf_counter()
+            self.memory_handler.ensure_loaded()
+            if self.dedupe_mode:
+                self.memory_index.near_duplicates(self.dedupe_similarity)
+            client = self.get_client()
+            if client is not None:
+                client.warm_up()
+            logging.info(f"Preloaded word vectors and API client in {time.perf_counter() - start:.2f}s.")
+        except Exception as e:
+            logging.error(f"Error preloading: {str(e)}")
+
+    def preload_in_background(self):
+        threading.Thread(target=self.preload, name="preload", daemon=True).start()
+
+    def start_folder_watcher(self):
+        """
+        Start ingesting the folder set as WATCHED_FOLDER in config.json, if any, in the background.
+        """
+        folder = self.config.get("WATCHED_FOLDER")
+        if not folder or self.folder_watcher is not None:
+            return
+        from .folder_watcher import FolderWatcher
+        self.folder_watcher = FolderWatcher(
+            self,
+            folder,
+            debounce_seconds=self.config.get("WATCHED_FOLDER_DEBOUNCE_SECONDS", 2.0),
+            recursive=self.config.get("WATCHED_FOLDER_RECURSIVE", True),
+        )
+        self.folder_watcher.start()
+
     def init_conversation(self):
         """
-        Initialize a new conversation with a new folder, database, and Word2Vec model.
+        Initialize a new conversation with a new folder, database, and Word2Vec overlay.
         """
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         self.conv_folder = os.path.join(self.memory_dir, f"memory_{timestamp}")
         os.makedirs(self.conv_folder, exist_ok=True)
         self.db_path = os.path.join(self.conv_folder, "conversations.db")
-        self.memory_handler = MemoryHandler(self.conv_folder)
+        if self.memory_handler:
+            # Finish the previous overlay's training off the UI thread; this is a no-op if
+            # release_conversation already stopped it before its folder was removed
+            threading.Thread(target=self.memory_handler.close, kwargs={"flush": True}, name="close-overlay", daemon=True).start()
+        self.memory_handler = MemoryHandler(
+            self.conv_folder,
+            base_vectors_path=self.base_vectors_path,
+            training_batch_size=self.config.get("WORD2VEC_BATCH_SIZE", 32),
+            training_max_wait_seconds=self.config.get("WORD2VEC_MAX_WAIT_SECONDS", 30.0),
+            base_seed_model_path=self.config.get("BASE_SEED_MODEL_PATH") or None,
+            consolidate_overlays=self.config.get("BASE_VECTORS_CONSOLIDATE", True),
+        )
         self.init_db()
-        if not os.path.exists(self.memory_handler.model_path):
-            logging.info("Initializing Word2Vec model with default data.")
-            self.memory_handler.load_or_train_word2vec_model()
 
     def init_db(self):
         """
-        Initialize the SQLite database for the conversation.
-        """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''CREATE TABLE IF NOT EXISTS conversations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT,
-                message TEXT,
-                message_summary TEXT,
-                embedding TEXT
-            )''')
-        conn.commit()
-        conn.close()
+        Open the SQLite store for the conversation, creating or migrating its schema.
+        """
+        if self.store:
+            self.store.close()
+        self.store = ConversationStore(self.db_path)
+        self.memory_index = MemoryIndex()
+        self.memory_index.load(*self.store.load_embedding_matrix())
+        self.chunk_index = MemoryIndex()
+        self.chunk_index.load(*self.store.load_chunk_embedding_matrix())
+        if self.rolling_summary:
+            self.rolling_summary.reset()
         logging.info(f"Database initialized at {self.db_path}")
 
+    def close_db(self):
+        """
+        Close the conversation's database connection, e.g. before its folder is removed.
+        """
+        if self.store:
+            self.store.close()
+            self.store = None
+
     def get_previous_conversations(self):
         """
         Retrieve previous conversations from the database, but only the summaries.
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT message_summary FROM conversations ORDER BY timestamp ASC")
-            rows = cursor.fetchall()
-            conversations = [{"message": row[0]} for row in rows]  # Use summaries only
-            conn.close()
-            return conversations
+            return [{"message": summary} for summary in self.store.fetch_summaries()]  # Use summaries only
         except Exception as e:
             logging.error(f"Error retrieving previous conversations: {str(e)}")
             return []
 
-    def process_query(self, user_message):
+    def get_conversation_page(self, before_id, limit):
+        """
+        Retrieve the page of (id, message) rows saved before row before_id in chronological
+        order, for transcript paging.
+        """
+        try:
+            return self.store.fetch_message_page(before_id, limit)
+        except Exception as e:
+            logging.error(f"Error retrieving conversation page: {str(e)}")
+            return []
+
+    def retrieve_relevant_conversations(self, user_message):
+        """
+        Select the stored turns to send with the user message.
+
+        In rolling summary mode the turns already folded into the rolling summary are
+        replaced by it, and all turns after it are sent as recent turns.
+
+        Returns:
+            tuple: (recent rows oldest first, retrieved rows best match first), as
+            (id, summary, token_count) tuples.
+        """
+        if self.rolling_summary:
+            summary_row, recent = self.rolling_summary.context_rows()
+            if summary_row is not None:
+                recent = [summary_row] + recent
+            if not self.retrieval_mode:
+                return recent, []
+        elif not self.retrieval_mode:
+            return self.store.fetch_all_summaries(), []
+        else:
+            recent = self.store.fetch_recent_summaries(self.retrieval_recent_turns)
+        recent_ids = {row[0] for row in recent}
+        query_embedding = self.memory_handler.sentence_to_vec(user_message)
+        matches = self.memory_index.search(
+            query_embedding,
+            self.retrieval_top_k,
+            min_similarity=self.retrieval_min_similarity,
+            exclude_ids=recent_ids,
+        )
+        rank = {row_id: position for position, (row_id, _) in enumerate(matches)}
+        retrieved = self.store.fetch_summaries_by_id(list(rank))
+        retrieved.sort(key=lambda row: rank[row[0]])
+        logging.debug(f"Retrieved {len(retrieved)} relevant and {len(recent)} recent turns.")
+        return recent, retrieved
+
+    def retrieve_document_chunks(self, user_message):
+        """
+        Select the chunks of uploaded documents that best match the user message.
+
+        Returns:
+            list: (id, excerpt, token_count) tuples, best match first.
+        """
+        if not len(self.chunk_index):
+            return []
+        query_embedding = self.memory_handler.sentence_to_vec(user_message)
+        matches = self.chunk_index.search(query_embedding, self.document_top_k, min_similarity=self.document_min_similarity)
+        rank = {row_id: position for position, (row_id, _) in enumerate(matches)}
+        chunks = self.store.fetch_document_chunks_by_id(list(rank))
+        chunks.sort(key=lambda row: rank[row[0]])
+        logging.debug(f"Retrieved {len(chunks)} document excerpts.")
+        return [(row_id, content, token_count) for row_id, _, _, content, token_count in chunks]
+
+    def add_document_chunks(self, file_path, chunks, embeddings=None, batch_size=1024, start_index=0):
+        """
+        Embed the chunks of an uploaded document and store them for retrieval.
+        Precomputed embeddings (e.g. from the ingestion cache) are used as they are. A document
+        read as a stream can be added in consecutive batches, numbered from start_index.
+
+        Returns:
+            numpy.ndarray: The chunk embeddings, or None if they could not be computed.
+        """
+        name = os.path.basename(file_path)
+        start = time.perf_counter()
+        if embeddings is not None and embeddings.shape != (len(chunks), self.memory_handler.vector_size):
+            # Cached with word vectors of another size
+            embeddings = None
+        batches = []
+        for offset in range(0, len(chunks), batch_size):
+            batch = chunks[offset:offset + batch_size]
+            if embeddings is not None:
+                batch_embeddings = embeddings[offset:offset + batch_size]
+            else:
+                # Embed the passage alone so the excerpt header does not dilute it
+                batch_embeddings = self.memory_handler.sentences_to_vecs(batch, use_cache=False)
+            if batch_embeddings is None:
+                logging.error(f"Could not embed the chunks of {name}; they will not be retrieved.")
+                return None
+            batches.append(batch_embeddings)
+            excerpts = [
+                f"Excerpt from {name} (part {index + 1}):\n{chunk}"
+                for index, chunk in enumerate(batch, start=start_index + offset)
+            ]
+            token_counts = [self.token_counter.count_message(excerpt) for excerpt in excerpts]
+            row_ids = self.store.insert_document_chunks(file_path, excerpts, batch_embeddings, token_counts, start_index=start_index + offset)
+            self.chunk_index.add_many(row_ids, batch_embeddings)
+        logging.info(f"Stored {len(chunks)} chunks of {name} for retrieval in {time.perf_counter() - start:.2f}s.")
+        return np.concatenate(batches) if batches else None
+
+    def remove_document(self, file_path):
+        """
+        Remove what an earlier version of an uploaded file added to this conversation: its
+        upload turn and its retrieval chunks, from the database and from the in-memory indexes.
+        """
+        turns = self.store.delete_uploads(file_path)
+        chunks = self.store.delete_document_chunks(file_path)
+        if turns:
+            self.memory_index.load(*self.store.load_embedding_matrix())
+        if chunks:
+            self.chunk_index.load(*self.store.load_chunk_embedding_matrix())
+        if turns or chunks:
+            logging.info(f"Removed the previous version of {os.path.basename(file_path)} ({chunks} chunks).")
+
+    def add_cached_document(self, file_path, content_hash, document):
+        """
+        Add a document from the ingestion cache to this conversation without processing it again.
+        Returns the row id of its upload turn.
+        """
+        name = os.path.basename(file_path)
+        row_id = self.save_conversation(f"Uploaded file: {name}", document["summary"], summary=document["summary"])
+        self.store.record_upload(content_hash, row_id, file_path)
+        self.add_document_chunks(file_path, document["chunks"], embeddings=document["embeddings"])
+        return row_id
+
+    def with_token_counts(self, rows):
+        """
+        Fill in missing token counts for (id, summary, token_count) rows and cache them in the database.
+        """
+        counted = []
+        missing = []
+        for row_id, summary, token_count in rows:
+            if token_count is None:
+                token_count = self.token_counter.count_message(summary)
+                missing.append((row_id, token_count))
+            counted.append((row_id, summary, token_count))
+        if missing:
+            self.store.update_token_counts(missing)
+        return counted
+
+    def drop_near_duplicates(self, recent, retrieved):
+        """
+        Keep only the newest of the candidate turns that are near-duplicates of each other,
+        going by the similarity of their embeddings.
+
+        Returns:
+            tuple: (recent rows, retrieved rows, number of rows dropped, tokens saved).
+        """
+        newer = self.memory_index.near_duplicates(self.dedupe_similarity)
+        if not newer:
+            return recent, retrieved, 0, 0
+
+        def group_of(row_id):
+            # Follow the chain of newer duplicates to the newest one
+            seen = set()
+            while row_id in newer and row_id not in seen:
+                seen.add(row_id)
+                row_id = newer[row_id]
+            return row_id
+
+        keep = {}
+        for row in recent + retrieved:
+            group = group_of(row[0])
+            if group not in keep or row[0] > keep[group]:
+                keep[group] = row[0]
+        kept_ids = set(keep.values())
+        dropped = [row for row in recent + retrieved if row[0] not in kept_ids]
+        if not dropped:
+            return recent, retrieved, 0, 0
+        recent = [row for row in recent if row[0] in kept_ids]
+        retrieved = [row for row in retrieved if row[0] in kept_ids]
+        return recent, retrieved, len(dropped), sum(row[2] or 0 for row in dropped)
+
+    def build_context_messages(self, user_message):
+        """
+        Build the list of messages sent to the model for the given user message, within
+        the token budget of the current model.
+        """
         try:
-            # Retrieve previous conversations for context (summaries only)
-            previous_conversations = self.get_previous_conversations()
-            context_messages = [{"role": "system", "content": "You are an AI assistant."}]
-            for conv in previous_conversations:
-                context_messages.append({"role": "user", "content": conv["message"]})
+            recent, retrieved = self.retrieve_relevant_conversations(user_message)
+            recent = self.with_token_counts(recent)
+            retrieved = self.with_token_counts(retrieved)
+        except Exception as e:
+            logging.error(f"Error retrieving previous conversations: {str(e)}")
+            recent, retrieved = [], []
+        duplicates_dropped, duplicate_tokens_saved = 0, 0
+        if self.dedupe_mode:
+            try:
+                recent, retrieved, duplicates_dropped, duplicate_tokens_saved = self.drop_near_duplicates(recent, retrieved)
+            except Exception as e:
+                logging.error(f"Error dropping near-duplicate memories: {str(e)}")
+            if duplicates_dropped:
+                logging.info(f"Dropped {duplicates_dropped} near-duplicate memories, saving {duplicate_tokens_saved} tokens.")
+        try:
+            documents = self.retrieve_document_chunks(user_message)
+        except Exception as e:
+            logging.error(f"Error retrieving document excerpts: {str(e)}")
+            documents = []
 
-            # Add the current user message
-            context_messages.append({"role": "user", "content": user_message})
+        context_messages, report = self.context_assembler.assemble(SYSTEM_PROMPT, user_message, recent, retrieved, documents)
+        report["duplicates_dropped"] = duplicates_dropped
+        report["duplicate_tokens_saved"] = duplicate_tokens_saved
+        self.last_context_report = report
+        logging.debug(f"Context assembled: {report}")
+        return context_messages
+
+    def process_query(self, user_message, cancel_token=None, use_cache=True, on_saved=None):
+        """
+        Return the AI response for the user message and save the turn; on_saved, if given,
+        is called with the row id of the saved turn.
+        """
+        try:
+            context_messages = self.build_context_messages(user_message)
 
             # Generate a response from the AI model
-            completion = self.client.chat.completions.create(
+            completion = self.get_client().chat_completion(
                 model=self.MODEL_NAME,
                 messages=context_messages,
-                extra_headers={"HTTP-Referer": "your_site_url", "X-Title": "your_app_name"}
+                cancel_token=cancel_token,
+                use_cache=use_cache,
             )
             if completion.choices and completion.choices[0].message:
                 response_message = completion.choices[0].message.content
-                self.save_conversation(user_message, response_message)
+                row_id = self.save_conversation(user_message, response_message)
+                if on_saved:
+                    on_saved(row_id)
                 return response_message
             else:
                 logging.error("Error processing query: No message found in API response.")
                 return None
+        except RequestCancelled:
+            logging.info(f"Request cancelled; worker stopped {cancel_token.latency() * 1000:.1f} ms after cancel.")
+            return None
         except Exception as e:
             logging.error(f"Error processing query: {str(e)}")
             return None
 
+    def process_query_stream(self, user_message, cancel_token=None, use_cache=True, on_saved=None):
+        """
+        Stream the AI response for the user message, yielding text deltas as they arrive.
+        The finished turn is saved once the stream completes, and on_saved, if given, is
+        called with its row id; errors are raised to the caller.
+
+        Cancelling cancel_token aborts the HTTP stream, which ends the generator early
+        without saving the turn. use_cache=False skips the response cache.
+        """
+        try:
+            context_messages = self.build_context_messages(user_message)
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            self.last_time_to_first_token = None
+            request_start = time.perf_counter()
+
+            response_parts = []
+            for delta in self.get_client().stream(model=self.MODEL_NAME, messages=context_messages, cancel_token=cancel_token, use_cache=use_cache):
+                if self.last_time_to_first_token is None:
+                    self.last_time_to_first_token = time.perf_counter() - request_start
+                    logging.info(f"Time to first token: {self.last_time_to_first_token:.3f}s")
+                response_parts.append(delta)
+                yield delta
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+        except RequestCancelled:
+            logging.info(f"Request cancelled; worker stopped {cancel_token.latency() * 1000:.1f} ms after cancel.")
+            return
+
+        response_message = "".join(response_parts)
+        logging.info(f"Stream completed in {time.perf_counter() - request_start:.3f}s ({len(response_message)} chars).")
+        if response_message:
+            row_id = self.save_conversation(user_message, response_message)
+            if on_saved:
+                on_saved(row_id)
+        else:
+            logging.error("Error processing query: Stream ended without any content.")
+
     def save_conversation(self, user_message, ai_response, summary=None, embedding=None):
         """
-        Save the conversation to the database with all fields in a single row.
-        Also, retrain the Word2Vec model on each summary chunk separately.
+        Save the conversation to the database with all fields in a single row and return its row id.
+        Also, queue each summary chunk for background Word2Vec retraining.
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
         # Combine user query and AI response into a single message
         combined_message = f"User: {user_message}\nAI: {ai_response}"
         
@@ -157,21 +519,19 @@ class ConversationManager:
         if embedding is None:
             embedding = self.memory_handler.sentence_to_vec(summary)
         
-        # Convert embedding to a JSON-serializable format (if it's a numpy array)
-        if isinstance(embedding, np.ndarray):
-            embedding = json.dumps(embedding.tolist())
-        
         # Insert the conversation into the database
-        cursor.execute('''INSERT INTO conversations (timestamp, message, message_summary, embedding)
-                          VALUES (?, ?, ?, ?)''',
-                       (timestamp, combined_message, summary, embedding))
-        conn.commit()
-        conn.close()
+        token_count = self.token_counter.count_message(summary)
+        row_id = self.store.insert_conversation(combined_message, summary, embedding, token_count)
+        if embedding is not None:
+            self.memory_index.add(row_id, embedding)
         logging.info("Conversation saved to the database.")
 
-        # Split the summary into chunks and train Word2Vec on each chunk
+        # Split the summary into chunks and queue them for background Word2Vec training
         summary_chunks = self.split_summary_into_chunks(summary)
-        self.memory_handler.train_word2vec(summary_chunks)
+        self.memory_handler.enqueue_training(summary_chunks)
+        if self.rolling_summary:
+            self.rolling_summary.maybe_fold()
+        return row_id
 
     def generate_summary(self, ai_response):
         """
@@ -210,10 +570,22 @@ class ConversationManager:
         else:
             logging.error("FilePicker is not initialized.")
 
+    def release_conversation(self):
+        """
+        Stop everything that writes into the conversation's folder, so it can be removed:
+        the watched-folder ingestion, the database and the background Word2Vec trainer.
+        """
+        if self.folder_watcher:
+            self.folder_watcher.cancel_current()
+        self.close_db()
+        if self.memory_handler:
+            self.memory_handler.close(flush=False)
+
     def clear_conversation(self, new_conversation=True):
         """
         Clear the current conversation and optionally start a new one.
         """
+        self.release_conversation()
         if self.conv_folder:
             for root, dirs, files in os.walk(self.conv_folder, topdown=False):
                 for name in files:
@@ -223,4 +595,7 @@ class ConversationManager:
             os.rmdir(self.conv_folder)
         
         if new_conversation:
-            self.init_conversation()
\ No newline at end of file
+            self.init_conversation()
+            if self.folder_watcher:
+                # Bring the watched folder's files into the new conversation
+                self.folder_watcher.resync()
\ No newline at end of file
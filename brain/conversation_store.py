@@ -0,0 +1,404 @@
+import sqlite3
+import threading
+import logging
+import datetime
+import json
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+EMBEDDING_DTYPE = np.float32
+
+INSERT_CONVERSATION = '''INSERT INTO conversations (timestamp, created_at, message, message_summary, embedding_vector, token_count)
+                         VALUES (?, ?, ?, ?, ?, ?)'''
+SELECT_SUMMARIES = "SELECT message_summary FROM conversations ORDER BY created_at ASC, id ASC"
+SELECT_MESSAGE_PAGE = "SELECT id, message FROM conversations WHERE id < ? ORDER BY id DESC LIMIT ?"
+SELECT_ALL_SUMMARIES = '''SELECT id, message_summary, token_count FROM conversations
+                          ORDER BY created_at ASC, id ASC'''
+SELECT_RECENT_SUMMARIES = '''SELECT id, message_summary, token_count FROM conversations
+                             ORDER BY created_at DESC, id DESC LIMIT ?'''
+UPDATE_TOKEN_COUNT = "UPDATE conversations SET token_count = ? WHERE id = ?"
+SELECT_EMBEDDINGS = '''SELECT id, embedding_vector FROM conversations
+                       WHERE embedding_vector IS NOT NULL ORDER BY created_at ASC, id ASC'''
+INSERT_DOCUMENT_CHUNK = '''INSERT INTO document_chunks (document, chunk_index, content, token_count, embedding_vector, created_at)
+                           VALUES (?, ?, ?, ?, ?, ?)'''
+SELECT_CHUNK_EMBEDDINGS = '''SELECT id, embedding_vector FROM document_chunks
+                             WHERE embedding_vector IS NOT NULL ORDER BY id ASC'''
+SELECT_SUMMARIES_AFTER = "SELECT id, message_summary, token_count FROM conversations WHERE id > ? ORDER BY id ASC"
+SELECT_MESSAGES_AFTER = "SELECT id, message FROM conversations WHERE id > ? ORDER BY id ASC LIMIT ?"
+UPSERT_UPLOAD = "INSERT OR REPLACE INTO uploads (content_hash, row_id, document) VALUES (?, ?, ?)"
+SELECT_UPLOAD = '''SELECT uploads.row_id, conversations.message_summary FROM uploads
+                   JOIN conversations ON conversations.id = uploads.row_id WHERE uploads.content_hash = ?'''
+INSERT_ROLLING_SUMMARY = '''INSERT INTO summaries (level, first_row_id, last_row_id, content, token_count, created_at)
+                            VALUES (?, ?, ?, ?, ?, ?)'''
+SELECT_ACTIVE_SUMMARIES = '''SELECT id, level, first_row_id, last_row_id, content, token_count FROM summaries
+                             WHERE folded_into IS NULL ORDER BY first_row_id ASC'''
+SELECT_SUMMARIZED_UP_TO = "SELECT COALESCE(MAX(last_row_id), 0) FROM summaries"
+
+
+def encode_embedding(embedding):
+    """
+    Encode an embedding as a float32 BLOB.
+    """
+    if embedding is None:
+        return None
+    return np.asarray(embedding, dtype=EMBEDDING_DTYPE).tobytes()
+
+
+def decode_embedding(blob):
+    """
+    Decode a float32 BLOB into a read-only numpy view over the same bytes (no copy).
+    """
+    if blob is None:
+        return None
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPE)
+
+
+def _migrate_create_conversations(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS conversations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            message TEXT,
+            message_summary TEXT,
+            embedding TEXT
+        )''')
+
+
+def _migrate_integer_timestamp(conn):
+    """
+    Add an indexed integer timestamp (microseconds since the epoch) and backfill it
+    from the existing "YYYY-MM-DD HH:MM:SS" text column, which holds local time.
+    """
+    conn.execute("ALTER TABLE conversations ADD COLUMN created_at INTEGER")
+    conn.execute("UPDATE conversations SET created_at = CAST(strftime('%s', timestamp, 'utc') AS INTEGER) * 1000000")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_created_at ON conversations (created_at, id)")
+
+
+def _migrate_binary_embeddings(conn):
+    """
+    Move embeddings from JSON text into a float32 BLOB column and clear the JSON copies.
+    """
+    conn.execute("ALTER TABLE conversations ADD COLUMN embedding_vector BLOB")
+    rows = conn.execute("SELECT id, embedding FROM conversations WHERE embedding IS NOT NULL").fetchall()
+    converted = []
+    for row_id, embedding in rows:
+        try:
+            converted.append((encode_embedding(json.loads(embedding)), row_id))
+        except (TypeError, ValueError):
+            logging.warning(f"Skipping unreadable embedding in conversation row {row_id}.")
+    conn.executemany("UPDATE conversations SET embedding_vector = ?, embedding = NULL WHERE id = ?", converted)
+
+
+def _migrate_token_counts(conn):
+    """
+    Add a cached per-row token count for the summary; existing rows are filled in lazily.
+    """
+    conn.execute("ALTER TABLE conversations ADD COLUMN token_count INTEGER")
+
+
+def _migrate_document_chunks(conn):
+    """
+    Add a table for the chunks of uploaded documents, used for retrieval at query time.
+    """
+    conn.execute('''CREATE TABLE IF NOT EXISTS document_chunks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            document TEXT,
+            chunk_index INTEGER,
+            content TEXT,
+            token_count INTEGER,
+            embedding_vector BLOB,
+            created_at INTEGER
+        )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_document_chunks_document ON document_chunks (document, chunk_index)")
+
+
+def _migrate_rolling_summaries(conn):
+    """
+    Add a table for the rolling summary of older turns. Each summary covers the turns
+    first_row_id..last_row_id; folded_into points at the higher-level summary that replaced it.
+    """
+    conn.execute('''CREATE TABLE IF NOT EXISTS summaries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            level INTEGER,
+            first_row_id INTEGER,
+            last_row_id INTEGER,
+            content TEXT,
+            token_count INTEGER,
+            folded_into INTEGER,
+            created_at INTEGER
+        )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_active ON summaries (folded_into, first_row_id)")
+
+
+def _migrate_uploads(conn):
+    """
+    Add a table mapping the content hash of each uploaded file to its upload turn and path.
+    """
+    conn.execute('''CREATE TABLE IF NOT EXISTS uploads (
+            content_hash TEXT PRIMARY KEY,
+            row_id INTEGER,
+            document TEXT
+        )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_uploads_document ON uploads (document)")
+
+
+# Ordered schema migrations; the index + 1 is the schema version stored in PRAGMA user_version
+MIGRATIONS = [
+    _migrate_create_conversations,
+    _migrate_integer_timestamp,
+    _migrate_binary_embeddings,
+    _migrate_token_counts,
+    _migrate_document_chunks,
+    _migrate_rolling_summaries,
+    _migrate_uploads,
+]
+
+
+class ConversationStore:
+    def __init__(self, db_path):
+        """
+        Open a long-lived SQLite connection for a conversation database.
+
+        The connection is shared between the UI and worker threads and guarded by a lock.
+        It runs in WAL mode, and the schema is migrated to the latest version on open.
+        """
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, cached_statements=64)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.migrate()
+
+    def migrate(self):
+        """
+        Apply any schema migrations newer than the database's user_version.
+        """
+        with self.lock:
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            for target_version, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                self.conn.execute("BEGIN")
+                try:
+                    migration(self.conn)
+                    self.conn.execute(f"PRAGMA user_version = {target_version}")
+                    self.conn.execute("COMMIT")
+                except Exception:
+                    self.conn.execute("ROLLBACK")
+                    raise
+                logging.info(f"Migrated {self.db_path} to schema version {target_version}.")
+
+    def insert_conversation(self, message, summary, embedding, token_count=None):
+        """
+        Insert a conversation turn and return its row id.
+        The embedding is stored as a float32 BLOB.
+        """
+        now = datetime.datetime.now()
+        timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+        created_at = int(now.timestamp() * 1_000_000)
+        embedding_blob = encode_embedding(embedding)
+        with self.lock:
+            cursor = self.conn.execute(INSERT_CONVERSATION, (timestamp, created_at, message, summary, embedding_blob, token_count))
+            return cursor.lastrowid
+
+    def fetch_summaries(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute(SELECT_SUMMARIES)]
+
+    def fetch_all_summaries(self):
+        """
+        Return the (id, summary, token_count) rows of every turn, oldest first.
+        """
+        with self.lock:
+            return self.conn.execute(SELECT_ALL_SUMMARIES).fetchall()
+
+    def fetch_recent_summaries(self, limit):
+        """
+        Return the (id, summary, token_count) rows of the most recent turns, oldest first.
+        """
+        with self.lock:
+            rows = self.conn.execute(SELECT_RECENT_SUMMARIES, (limit,)).fetchall()
+        return rows[::-1]
+
+    def fetch_summaries_by_id(self, row_ids):
+        """
+        Return the (id, summary, token_count) rows for the given row ids, oldest first.
+        """
+        if not row_ids:
+            return []
+        placeholders = ",".join("?" * len(row_ids))
+        query = f"SELECT id, message_summary, token_count FROM conversations WHERE id IN ({placeholders}) ORDER BY created_at ASC, id ASC"
+        with self.lock:
+            return self.conn.execute(query, list(row_ids)).fetchall()
+
+    def fetch_summaries_after(self, row_id):
+        """
+        Return the (id, summary, token_count) rows of the turns after row_id, oldest first.
+        """
+        with self.lock:
+            return self.conn.execute(SELECT_SUMMARIES_AFTER, (row_id,)).fetchall()
+
+    def fetch_messages_after(self, row_id, limit):
+        """
+        Return up to limit (id, message) rows of the turns after row_id, oldest first.
+        """
+        with self.lock:
+            return self.conn.execute(SELECT_MESSAGES_AFTER, (row_id, limit)).fetchall()
+
+    def record_upload(self, content_hash, row_id, document):
+        """
+        Remember that the file with this content hash was uploaded from document as turn row_id.
+        """
+        with self.lock:
+            self.conn.execute(UPSERT_UPLOAD, (content_hash, row_id, document))
+
+    def delete_uploads(self, document):
+        """
+        Delete the upload turns of every version of a document, and their uploads rows,
+        in one transaction. Returns the number of turns deleted.
+        """
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                cursor = self.conn.execute(
+                    "DELETE FROM conversations WHERE id IN (SELECT row_id FROM uploads WHERE document = ?)", (document,),
+                )
+                self.conn.execute("DELETE FROM uploads WHERE document = ?", (document,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return cursor.rowcount
+
+    def find_upload(self, content_hash):
+        """
+        Return the (row id, summary) of the upload turn of a file with this content hash,
+        or None if it was not uploaded to this conversation.
+        """
+        with self.lock:
+            return self.conn.execute(SELECT_UPLOAD, (content_hash,)).fetchone()
+
+    def insert_rolling_summary(self, level, first_row_id, last_row_id, content, token_count, folds=()):
+        """
+        Insert a rolling summary and mark the summaries it replaces as folded into it, in one transaction.
+        """
+        created_at = int(datetime.datetime.now().timestamp() * 1_000_000)
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                cursor = self.conn.execute(INSERT_ROLLING_SUMMARY, (level, first_row_id, last_row_id, content, token_count, created_at))
+                summary_id = cursor.lastrowid
+                self.conn.executemany("UPDATE summaries SET folded_into = ? WHERE id = ?", [(summary_id, fold) for fold in folds])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return summary_id
+
+    def fetch_active_summaries(self):
+        """
+        Return the (id, level, first_row_id, last_row_id, content, token_count) rows of the
+        summaries not folded into another one, oldest turns first.
+        """
+        with self.lock:
+            return self.conn.execute(SELECT_ACTIVE_SUMMARIES).fetchall()
+
+    def summarized_up_to(self):
+        """
+        Return the id of the last turn covered by a rolling summary, or 0.
+        """
+        with self.lock:
+            return self.conn.execute(SELECT_SUMMARIZED_UP_TO).fetchone()[0]
+
+    def update_token_counts(self, counts):
+        """
+        Cache token counts for rows, given (row id, token count) pairs.
+        """
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(UPDATE_TOKEN_COUNT, [(token_count, row_id) for row_id, token_count in counts])
+            self.conn.execute("COMMIT")
+
+    def fetch_message_page(self, before_id, limit):
+        """
+        Return up to limit (id, message) rows older than before_id (or the newest rows if it
+        is None), oldest first.
+        """
+        if before_id is None:
+            before_id = 2 ** 63 - 1
+        with self.lock:
+            rows = self.conn.execute(SELECT_MESSAGE_PAGE, (before_id, limit)).fetchall()
+        rows.reverse()
+        return rows
+
+    def insert_document_chunks(self, document, chunks, embeddings, token_counts, start_index=0):
+        """
+        Insert the chunks of a document in one transaction and return their row ids.
+        The chunks are numbered from start_index, so a document can be inserted in batches.
+        """
+        created_at = int(datetime.datetime.now().timestamp() * 1_000_000)
+        row_ids = []
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                for chunk_index, (content, embedding, token_count) in enumerate(zip(chunks, embeddings, token_counts), start=start_index):
+                    cursor = self.conn.execute(
+                        INSERT_DOCUMENT_CHUNK,
+                        (document, chunk_index, content, token_count, encode_embedding(embedding), created_at),
+                    )
+                    row_ids.append(cursor.lastrowid)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return row_ids
+
+    def delete_document_chunks(self, document):
+        """
+        Delete every chunk of a document and return the number of chunks deleted.
+        """
+        with self.lock:
+            return self.conn.execute("DELETE FROM document_chunks WHERE document = ?", (document,)).rowcount
+
+    def fetch_document_chunks_by_id(self, row_ids):
+        """
+        Return the (id, document, chunk_index, content, token_count) rows for the given chunk ids.
+        """
+        if not row_ids:
+            return []
+        placeholders = ",".join("?" * len(row_ids))
+        query = f"SELECT id, document, chunk_index, content, token_count FROM document_chunks WHERE id IN ({placeholders})"
+        with self.lock:
+            return self.conn.execute(query, list(row_ids)).fetchall()
+
+    def load_chunk_embedding_matrix(self):
+        """
+        Load the embeddings of all document chunks, like load_embedding_matrix.
+        """
+        return self.load_embedding_matrix(SELECT_CHUNK_EMBEDDINGS)
+
+    def load_embedding_matrix(self, query=SELECT_EMBEDDINGS):
+        """
+        Load all of the conversation's embeddings as one contiguous float32 matrix.
+
+        Returns:
+            tuple: (row ids as an int64 array, matrix of shape (rows, dimensions)).
+        """
+        with self.lock:
+            rows = self.conn.execute(query).fetchall()
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=EMBEDDING_DTYPE)
+
+        # Rows written by a model with a different vector size cannot share the matrix
+        row_bytes = len(rows[-1][1])
+        rows = [row for row in rows if len(row[1]) == row_bytes]
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        buffer = b"".join(row[1] for row in rows)
+        matrix = np.frombuffer(buffer, dtype=EMBEDDING_DTYPE).reshape(len(rows), -1)
+        return ids, matrix
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
\ No newline at end of file
@@ -0,0 +1,272 @@
+import io
+import os
+import csv
+import time
+import logging
+from collections import Counter
+from itertools import islice
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+SNIFF_BYTES = 64 * 1024
+# Inferred column types, from the most to the least specific
+TYPE_ORDER = ["integer", "float", "date", "text"]
+
+
+class ColumnStats:
+    def __init__(self, name, max_distinct):
+        """
+        Running statistics of one column, updated one block of values at a time.
+        """
+        self.name = name
+        self.max_distinct = max_distinct
+        self.type = None  # Inferred from the first non-empty block, then only ever widened
+        self.count = 0
+        self.missing = 0
+        # Numeric columns: mean and sum of squared deviations, combined across blocks (Chan et al.)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = None
+        self.maximum = None
+        # Text columns
+        self.min_length = None
+        self.max_length = None
+        self.distinct = Counter()
+        self.distinct_overflow = False
+
+    def update(self, values):
+        """
+        Add a block of raw string values (a NumPy unicode array).
+        """
+        present = values[np.char.str_len(values) > 0]
+        self.missing += len(values) - len(present)
+        if not len(present):
+            return
+
+        lengths = np.char.str_len(present)
+        self.min_length = int(lengths.min()) if self.min_length is None else min(self.min_length, int(lengths.min()))
+        self.max_length = int(lengths.max()) if self.max_length is None else max(self.max_length, int(lengths.max()))
+        if not self.distinct_overflow:
+            uniques, counts = np.unique(present, return_counts=True)
+            self.distinct.update(dict(zip(uniques.tolist(), counts.tolist())))
+            if len(self.distinct) > self.max_distinct:
+                # Too many to be categorical; keep only the most frequent seen so far
+                self.distinct = Counter(dict(self.distinct.most_common(self.max_distinct)))
+                self.distinct_overflow = True
+
+        if self.type != "text":
+            # Try the column's current type first; most blocks match it
+            parsed = self._parse(present, self.type) if self.type is not None else None
+            block_type = self.type if parsed is not None else None
+            if parsed is None:
+                block_type, parsed = self._infer(present)
+            if self.type is None or (self.type == "integer" and block_type == "float"):
+                self.type = block_type
+            elif block_type != self.type:
+                # E.g. integers in a float column: parse the block as the column type
+                parsed = self._parse(present, self.type) if block_type != "text" else None
+                if parsed is None:
+                    # Mixed types; only the text statistics apply from now on
+                    self.type = "text"
+                    self.minimum = self.maximum = None
+
+        if self.type in ("integer", "float"):
+            self._update_numeric(parsed)
+        elif self.type == "date":
+            self._update_range(parsed.min(), parsed.max())
+        self.count += len(present)
+
+    def _infer(self, values):
+        for candidate in TYPE_ORDER[:-1]:
+            parsed = self._parse(values, candidate)
+            if parsed is not None:
+                return candidate, parsed
+        return "text", None
+
+    @staticmethod
+    def _parse(values, column_type):
+        """
+        Parse a block as the given type, or return None if any value does not fit it.
+        """
+        try:
+            if column_type == "integer":
+                return values.astype(np.int64)
+            if column_type == "float":
+                parsed = values.astype(np.float64)
+                return parsed if np.isfinite(parsed).all() else None
+            if column_type == "date":
+                parsed = values.astype("datetime64[s]")
+                return None if np.isnat(parsed).any() else parsed
+        except (ValueError, OverflowError):
+            return None
+        return None
+
+    def _update_numeric(self, parsed):
+        parsed = parsed.astype(np.float64)
+        count = len(parsed)
+        mean = float(parsed.mean())
+        m2 = float(((parsed - mean) ** 2).sum())
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self._update_range(parsed.min(), parsed.max())
+
+    def _update_range(self, minimum, maximum):
+        self.minimum = minimum if self.minimum is None else min(self.minimum, minimum)
+        self.maximum = maximum if self.maximum is None else max(self.maximum, maximum)
+
+    def summary(self):
+        """
+        Return the column's statistics as a dictionary.
+        """
+        result = {"name": self.name, "type": self.type or "empty", "count": self.count, "missing": self.missing}
+        if self.type in ("integer", "float"):
+            result.update({
+                "min": self.minimum.item() if hasattr(self.minimum, "item") else self.minimum,
+                "max": self.maximum.item() if hasattr(self.maximum, "item") else self.maximum,
+                "mean": self.mean,
+                "std": (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0.0,
+            })
+            if self.type == "integer":
+                result["min"], result["max"] = int(result["min"]), int(result["max"])
+        elif self.type == "date":
+            result.update({"min": _format_date(self.minimum), "max": _format_date(self.maximum)})
+        if self.count:
+            result.update({
+                "distinct": len(self.distinct),
+                "distinct_is_lower_bound": self.distinct_overflow,
+                "top_values": self.distinct.most_common(5),
+                "min_length": self.min_length,
+                "max_length": self.max_length,
+            })
+        return result
+
+
+class CsvProfiler:
+    def __init__(self, block_rows=50000, sample_rows=5, max_distinct=1000):
+        """
+        Profile a CSV file in one streaming pass with bounded memory.
+
+        Rows are parsed with the csv module and collected into blocks of block_rows rows;
+        each block is turned into one NumPy array per column, on which types are inferred
+        and statistics are updated with vectorized operations. Only the running statistics,
+        up to max_distinct distinct values per column and the first sample_rows rows are
+        kept, so the profile stays small however large the file is.
+        """
+        self.block_rows = block_rows
+        self.sample_rows = sample_rows
+        self.max_distinct = max_distinct
+
+    def profile(self, file_path, encoding='utf-8'):
+        """
+        Return the profile of a CSV file as a dictionary.
+        """
+        start = time.perf_counter()
+        with open(file_path, 'r', encoding=encoding, errors='replace', newline='') as file:
+            dialect = self._sniff(file)
+            reader = csv.reader(file, dialect)
+            header = next(reader, None)
+            if header is None:
+                raise ValueError(f"{os.path.basename(file_path)} is empty.")
+            width = len(header)
+            columns = [ColumnStats(name.strip() or f"column_{index + 1}", self.max_distinct) for index, name in enumerate(header)]
+            sample = []
+            rows = 0
+            ragged = 0
+            while True:
+                block = list(islice(reader, self.block_rows))
+                if not block:
+                    break
+                if set(map(len, block)) != {width}:
+                    # Rare: drop blank lines and pad or cut rows to the header's width
+                    block = [row for row in block if row]
+                    ragged += sum(1 for row in block if len(row) != width)
+                    block = [row if len(row) == width else (row + [""] * width)[:width] for row in block]
+                    if not block:
+                        continue
+                if len(sample) < self.sample_rows:
+                    sample.extend(block[:self.sample_rows - len(sample)])
+                self._update(columns, block)
+                rows += len(block)
+
+        elapsed = time.perf_counter() - start
+        logging.info(f"Profiled {rows} rows x {width} columns of {os.path.basename(file_path)} in {elapsed:.2f}s.")
+        return {
+            "name": os.path.basename(file_path),
+            "rows": rows,
+            "delimiter": dialect.delimiter,
+            "ragged_rows": ragged,
+            "header": header,
+            "columns": [column.summary() for column in columns],
+            "sample": sample,
+            "seconds": elapsed,
+        }
+
+    @staticmethod
+    def _sniff(file):
+        sample = file.read(SNIFF_BYTES)
+        file.seek(0)
+        try:
+            return csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            # E.g. rows of uneven width; go by the most frequent candidate in the header line
+            first_line = sample.split("\n", 1)[0]
+            dialect = type("SniffedDialect", (csv.excel,), {})
+            dialect.delimiter = max(",;\t|", key=first_line.count)
+            return dialect
+
+    @staticmethod
+    def _update(columns, block):
+        # One (rows, columns) array per block; each column is a view into it
+        table = np.array(block, dtype=str)
+        for index, column in enumerate(columns):
+            column.update(table[:, index])
+
+
+def _format_date(value):
+    """
+    Format a datetime64, leaving out the time of day when it is midnight.
+    """
+    day = value.astype("datetime64[D]")
+    return str(day) if day == value else str(value)
+
+
+def format_profile(profile):
+    """
+    Render a profile as compact text for the model.
+    """
+    lines = [
+        f"Table profile of {profile['name']}: {profile['rows']:,} rows, {len(profile['columns'])} columns, "
+        f"delimiter {profile['delimiter']!r}."
+    ]
+    if profile["ragged_rows"]:
+        lines.append(f"{profile['ragged_rows']:,} rows had a different number of fields than the header.")
+    lines.append("")
+    lines.append("Columns:")
+    for column in profile["columns"]:
+        line = f"- {column['name']} ({column['type']}): {column['count']:,} values, {column['missing']:,} missing"
+        if column["type"] in ("integer", "float"):
+            line += f"; min {column['min']:g}, max {column['max']:g}, mean {column['mean']:.4g}, std {column['std']:.4g}"
+        elif column["type"] == "date":
+            line += f"; from {column['min']} to {column['max']}"
+        if column["count"]:
+            more = "more than " if column["distinct_is_lower_bound"] else ""
+            line += f"; {more}{column['distinct']:,} distinct"
+            if column["type"] == "text":
+                line += f"; length {column['min_length']}-{column['max_length']}"
+                if not column["distinct_is_lower_bound"]:
+                    top = ", ".join(f"{value} ({count:,})" for value, count in column["top_values"])
+                    line += f"; most common: {top}"
+        lines.append(line)
+    if profile["sample"]:
+        lines.append("")
+        lines.append("First rows:")
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator="\n")
+        writer.writerow(profile["header"])
+        writer.writerows(profile["sample"])
+        lines.append(output.getvalue().rstrip("\n"))
+    return "\n".join(lines)
\ No newline at end of file
@@ -0,0 +1,263 @@
+import os
+import re
+import time
+import logging
+import concurrent.futures
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+SUMMARY_SYSTEM_PROMPT = "You are an AI assistant that summarizes documents accurately and concisely."
+MAP_PROMPT = (
+    "Summarize part {index} of the document \"{name}\". "
+    "Keep the key facts, names, numbers and conclusions.\n\n{text}"
+)
+REDUCE_PROMPT = (
+    "These are summaries of consecutive parts of the document \"{name}\". "
+    "Combine them into one summary that keeps the key facts, names, numbers and conclusions.\n\n{text}"
+)
+PARAGRAPH_BREAK = re.compile(r"(\n\s*\n)")
+# Retrieval chunks embedded and stored at a time while a document is read
+RETRIEVAL_BATCH_CHUNKS = 256
+# Map progress is reported every this many summarized chunks
+MAP_REPORT_EVERY = 10
+
+class DocumentPipeline:
+    def __init__(self, conversation_manager, chunk_tokens=2000, max_concurrency=4, reduce_fan_in=8,
+                 retrieval_chunk_tokens=300, max_chunks=500):
+        """
+        Summarize an uploaded document with a map-reduce over the model.
+
+        The file is read as a stream and split into chunks of at most chunk_tokens tokens on
+        paragraph or line boundaries. Each chunk is submitted for summary as soon as it is read,
+        with at most max_concurrency calls running and as many more queued, and the summaries
+        are then combined reduce_fan_in at a time, level by level, until one summary is left.
+        Reading stops after max_chunks chunks (0 for no limit), and the user is told so.
+
+        The text is also split into smaller chunks of retrieval_chunk_tokens tokens, which
+        are embedded and stored batch by batch so later questions can retrieve the original
+        passages. Memory stays bounded however large the file is.
+        """
+        self.conversation_manager = conversation_manager
+        self.token_counter = conversation_manager.token_counter
+        self.chunk_tokens = chunk_tokens
+        self.retrieval_chunk_tokens = retrieval_chunk_tokens
+        self.max_concurrency = max_concurrency
+        self.reduce_fan_in = max(2, reduce_fan_in)
+        self.max_chunks = max_chunks
+
+    def iter_chunks(self, text_chunks, chunk_tokens=None):
+        """
+        Pack streamed text into chunks of at most chunk_tokens tokens (by default self.chunk_tokens),
+        yielding each one as soon as it is complete. Paragraphs and lines are kept whole unless
+        one alone is over the limit.
+        """
+        chunk_tokens = chunk_tokens or self.chunk_tokens
+        current = []
+        current_tokens = 0
+        for piece in self._pieces(text_chunks, chunk_tokens):
+            for part, part_tokens in self._fit(piece, chunk_tokens):
+                if current and current_tokens + part_tokens > chunk_tokens:
+                    chunk = "".join(current).strip()
+                    if chunk:
+                        yield chunk
+                    current = []
+                    current_tokens = 0
+                current.append(part)
+                current_tokens += part_tokens
+        chunk = "".join(current).strip()
+        if chunk:
+            yield chunk
+
+    def _fit(self, piece, chunk_tokens):
+        """
+        Yield (text, tokens) slices of a piece, cutting it into equal slices if it is over the limit.
+        """
+        tokens = self.token_counter.count(piece)
+        if tokens <= chunk_tokens:
+            yield piece, tokens
+            return
+        slices = -(-tokens // chunk_tokens) + 1
+        size = -(-len(piece) // slices)
+        for start in range(0, len(piece), size):
+            yield from self._fit(piece[start:start + size], chunk_tokens)
+
+    def _pieces(self, text_chunks, chunk_tokens):
+        """
+        Yield the paragraphs of streamed text. Text without paragraph breaks is yielded
+        line by line once it grows past the chunk size, so memory stays bounded.
+        """
+        # Roughly four characters per token
+        max_chars = chunk_tokens * 4
+        pending = ""
+        for text in text_chunks:
+            pending += text
+            parts = PARAGRAPH_BREAK.split(pending)
+            # The last part may continue in the next streamed chunk
+            pending = parts.pop()
+            yield from parts
+            if len(pending) > max_chars:
+                cut = pending.rfind("\n") + 1 or len(pending)
+                yield from pending[:cut].splitlines(keepends=True)
+                pending = pending[cut:]
+        if pending:
+            yield pending
+
+    def summarize_file(self, file_path, text_chunks, progress=None, cancel_token=None, content_hash=None, on_saved=None):
+        """
+        Summarize the document and store the summary in the conversation memory.
+
+        Args:
+            file_path: Path of the uploaded file, used for its name.
+            text_chunks: Iterable of the document's text, e.g. FilePicker.iter_file_chunks.
+            progress: Optional callable receiving progress messages for the chat window.
+            cancel_token: Optional CancelToken that aborts the model calls.
+            content_hash: Optional content hash of the file; the results are then kept in the
+                ingestion cache.
+            on_saved: Optional callable receiving the row id of the saved upload turn.
+
+        Returns:
+            str: The document summary.
+        """
+        name = os.path.basename(file_path)
+        report = progress or (lambda message: None)
+        start = time.perf_counter()
+        cache = self.conversation_manager.ingestion_cache if content_hash is not None else None
+
+        report(f"Reading and summarizing {name}...")
+        try:
+            summaries, truncated = self._map_document(file_path, text_chunks, name, report, cancel_token, cache, content_hash)
+            chunk_count = len(summaries)
+            if truncated:
+                logging.warning(f"{name} has more than {self.max_chunks} chunks; the rest was not read.")
+                report(
+                    f"{name} is longer than {self.max_chunks} chunks of {self.chunk_tokens} tokens, so only its beginning "
+                    f"is summarized and can be searched. Raise DOCUMENT_MAX_CHUNKS in config.json to read all of it."
+                )
+
+            level = 1
+            while len(summaries) > 1:
+                groups = [summaries[start:start + self.reduce_fan_in] for start in range(0, len(summaries), self.reduce_fan_in)]
+                prompts = [REDUCE_PROMPT.format(name=name, text="\n\n".join(group)) for group in groups]
+                summaries = self._summarize_all(prompts, f"summaries combined (level {level})", report, cancel_token)
+                level += 1
+        except Exception:
+            # Do not leave the retrieval chunks of an incomplete upload behind
+            self.conversation_manager.remove_document(file_path)
+            if cache is not None:
+                cache.remove(content_hash)
+            raise
+
+        summary = summaries[0]
+        row_id = self.conversation_manager.save_conversation(f"Uploaded file: {name}", summary, summary=summary)
+        if content_hash is not None:
+            self.conversation_manager.store.record_upload(content_hash, row_id, file_path)
+        if on_saved:
+            on_saved(row_id)
+
+        if cache is not None:
+            if truncated:
+                # Only part of the file was read; a later upload with a higher limit must read it again
+                cache.remove(content_hash)
+            else:
+                cache.put(content_hash, name, summary)
+        logging.info(f"Summarized {name} ({chunk_count} chunks, {level - 1} reduce levels) in {time.perf_counter() - start:.2f}s.")
+        return summary
+
+    def _map_document(self, file_path, text_chunks, name, report, cancel_token, cache, content_hash):
+        """
+        Summarize the chunks of the document as they are read and store its retrieval chunks
+        batch by batch meanwhile. Reading waits while twice max_concurrency calls are in flight.
+
+        Returns:
+            tuple: (the chunk summaries in document order, whether reading stopped at max_chunks)
+        """
+        summaries = {}
+        in_flight = {}
+        retrieval_chunks = []
+        stored = 0
+        truncated = False
+        chunks = self.iter_chunks(text_chunks)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_concurrency)
+        try:
+            for index, chunk in enumerate(chunks):
+                if self.max_chunks and index == self.max_chunks:
+                    truncated = True
+                    break
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                if len(in_flight) >= 2 * self.max_concurrency:
+                    self._collect(in_flight, summaries, concurrent.futures.FIRST_COMPLETED, report)
+                prompt = MAP_PROMPT.format(index=index + 1, name=name, text=chunk)
+                in_flight[executor.submit(self._summarize, prompt, cancel_token)] = index
+
+                # Keep the original passages for retrieval
+                retrieval_chunks.extend(self.iter_chunks([chunk], self.retrieval_chunk_tokens))
+                if len(retrieval_chunks) >= RETRIEVAL_BATCH_CHUNKS:
+                    self._store_retrieval_chunks(file_path, retrieval_chunks, stored, cache, content_hash)
+                    stored += len(retrieval_chunks)
+                    retrieval_chunks = []
+            if retrieval_chunks:
+                self._store_retrieval_chunks(file_path, retrieval_chunks, stored, cache, content_hash)
+            if in_flight:
+                self._collect(in_flight, summaries, concurrent.futures.ALL_COMPLETED, report)
+        finally:
+            # Stop reading, and drop the queued prompts if one failed or the upload was cancelled
+            chunks.close()
+            executor.shutdown(wait=False, cancel_futures=True)
+        if not summaries:
+            raise ValueError(f"No text could be extracted from {name}.")
+        if len(summaries) % MAP_REPORT_EVERY:
+            report(f"{len(summaries)} chunks summarized...")
+        return [summaries[index] for index in range(len(summaries))], truncated
+
+    def _collect(self, in_flight, summaries, return_when, report):
+        """
+        Wait for in-flight map calls and move their results from in_flight into summaries.
+        """
+        done, _ = concurrent.futures.wait(in_flight, return_when=return_when)
+        for future in done:
+            summaries[in_flight.pop(future)] = future.result()
+            if len(summaries) % MAP_REPORT_EVERY == 0:
+                report(f"{len(summaries)} chunks summarized...")
+
+    def _store_retrieval_chunks(self, file_path, chunks, start_index, cache, content_hash):
+        """
+        Embed and store a batch of retrieval chunks, and keep them in the ingestion cache if there is one.
+        """
+        embeddings = self.conversation_manager.add_document_chunks(file_path, chunks, start_index=start_index)
+        if cache is not None:
+            cache.put_chunks(content_hash, chunks, embeddings, start_index=start_index)
+
+    def _summarize_all(self, prompts, stage, report, cancel_token):
+        """
+        Run the prompts concurrently and return the summaries in prompt order.
+        """
+        results = [None] * len(prompts)
+        report_every = max(1, len(prompts) // 10)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(prompts)))
+        try:
+            futures = {executor.submit(self._summarize, prompt, cancel_token): index for index, prompt in enumerate(prompts)}
+            for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+                results[futures[future]] = future.result()
+                if done % report_every == 0 or done == len(prompts):
+                    report(f"{done}/{len(prompts)} {stage}.")
+        finally:
+            # Drop the queued prompts if one failed or the upload was cancelled
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results
+
+    def _summarize(self, prompt, cancel_token):
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        completion = self.conversation_manager.get_client().chat_completion(
+            model=self.conversation_manager.MODEL_NAME,
+            messages=[
+                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            cancel_token=cancel_token,
+        )
+        if not completion.choices or not completion.choices[0].message or not completion.choices[0].message.content:
+            raise ValueError("No message found in API response.")
+        return completion.choices[0].message.content.strip()
\ No newline at end of file
@@ -2,74 +2,219 @@ import os
 import tkinter as tk
 from tkinter import filedialog
 import logging
-import chardet
-import PyPDF2
-import docx
 import csv
+import codecs
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+READ_CHUNK_BYTES = 1 << 20  # Bytes read (and roughly characters yielded) per chunk
+ENCODING_SAMPLE_BYTES = 64 << 10  # Upper bound on the prefix used to detect the encoding
+TEXT_EXTENSIONS = ['.txt', '.py', '.js', '.java', '.html', '.css', '.cpp', '.c', '.sh', '.sql']
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
 class FilePicker:
     def __init__(self, conversation_manager):
         self.conversation_manager = conversation_manager
+        self.pdf_extractor = None
 
     def pick_file(self):
         """
-        Open a file dialog to select a file, read its content, and process it as a message.
+        Open a file dialog to select a file, then summarize it into the conversation memory.
         """
         root = tk.Tk()
         root.withdraw()
         file_path = filedialog.askopenfilename(title="Select a file to upload")
         if file_path:
             try:
-                content = self.read_file_content(file_path)
-                if content:
-                    # Process the file content as a user message
-                    self.conversation_manager.process_query(content)
+                summary = self.process_file(file_path)
+                self.conversation_manager.notify(summary)
             except Exception as e:
                 logging.error(f"Error processing file: {str(e)}")
                 self.conversation_manager.notify(f"Error processing file: {str(e)}")
 
-    def detect_encoding(self, file_path):
+    def process_file(self, file_path, progress=None, cancel_token=None, on_saved=None):
         """
-        Detect the encoding of a file.
+        Summarize a file chunk by chunk with the document pipeline and store the summary.
+
+        Files are identified by a hash of their content. A file already uploaded to this
+        conversation is not added again, a changed file replaces its previous version, and
+        one found in the ingestion cache is added without being read, extracted or sent to
+        the model. on_saved, if given, is called with the row id of a newly saved upload turn.
+
+        Returns:
+            str: The document summary.
         """
+        from .document_pipeline import DocumentPipeline
+        from .ingestion_cache import hash_file
+        conversation_manager = self.conversation_manager
+        cache = conversation_manager.ingestion_cache
+        name = os.path.basename(file_path)
+        content_hash = cache.content_hash(file_path) if cache is not None else hash_file(file_path)
+
+        upload = conversation_manager.store.find_upload(content_hash)
+        if upload is not None:
+            logging.info(f"{name} is already part of this conversation.")
+            return upload[1]
+        # The file changed since it was last added: its old version must not be retrieved any more
+        conversation_manager.remove_document(file_path)
+
+        document = cache.get(content_hash) if cache is not None else None
+        if document is not None:
+            if progress:
+                progress(f"{name} was processed before; reusing its summary.")
+            row_id = conversation_manager.add_cached_document(file_path, content_hash, document)
+            if on_saved:
+                on_saved(row_id)
+            logging.info(f"Reused the cached processing of {name} ({len(document['chunks'])} chunks).")
+            return document["summary"]
+
+        config = conversation_manager.config
+        pipeline = DocumentPipeline(
+            self.conversation_manager,
+            chunk_tokens=config.get("DOCUMENT_CHUNK_TOKENS", 2000),
+            max_concurrency=config.get("DOCUMENT_MAX_CONCURRENCY", 4),
+            reduce_fan_in=config.get("DOCUMENT_REDUCE_FAN_IN", 8),
+            retrieval_chunk_tokens=config.get("DOCUMENT_RETRIEVAL_CHUNK_TOKENS", 300),
+            max_chunks=config.get("DOCUMENT_MAX_CHUNKS", 500),
+        )
+        return pipeline.summarize_file(
+            file_path, self.iter_file_chunks(file_path), progress=progress, cancel_token=cancel_token, content_hash=content_hash,
+            on_saved=on_saved,
+        )
+
+    def detect_encoding(self, file_path, sample_size=ENCODING_SAMPLE_BYTES):
+        """
+        Detect the encoding of a file from at most sample_size bytes at its start.
+        """
+        from chardet.universaldetector import UniversalDetector
         with open(file_path, 'rb') as file:
-            raw_data = file.read()
-            result = chardet.detect(raw_data)
-            return result['encoding']
+            prefix = file.read(4)
+            for bom, encoding in BOMS:
+                if prefix.startswith(bom):
+                    return encoding
+            detector = UniversalDetector()
+            detector.feed(prefix)
+            remaining = sample_size - len(prefix)
+            while remaining > 0 and not detector.done:
+                block = file.read(min(remaining, 8192))
+                if not block:
+                    break
+                detector.feed(block)
+                remaining -= len(block)
+            detector.close()
+        encoding = detector.result['encoding']
+        if encoding is None or encoding.lower() == 'ascii':
+            # ASCII is also valid UTF-8, which copes with non-ASCII text after the sample
+            return 'utf-8'
+        return encoding
 
     def read_file_content(self, file_path):
         """
         Read the content of a file based on its extension.
+        Large files are better consumed with iter_file_chunks, which keeps memory bounded.
+        """
+        return "".join(self.iter_file_chunks(file_path))
+
+    def iter_file_chunks(self, file_path, chunk_size=READ_CHUNK_BYTES):
+        """
+        Read a file as a generator of text chunks, based on its extension.
+        Peak memory stays around chunk_size no matter how large the file is.
         """
         file_extension = os.path.splitext(file_path)[1].lower()
         if file_extension == '.pdf':
-            with open(file_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                content = ""
-                for page in reader.pages:
-                    content += page.extract_text()
-            return content
+            return self._iter_pdf_pages(file_path)
         elif file_extension == '.docx':
-            doc = docx.Document(file_path)
-            content = "\n".join([para.text for para in doc.paragraphs])
-            return content
-        elif file_extension == '.txt':
-            encoding = self.detect_encoding(file_path)
-            with open(file_path, 'r', encoding=encoding) as file:
-                content = file.read()
-            return content
+            return self._iter_docx_paragraphs(file_path, chunk_size)
         elif file_extension == '.csv':
-            encoding = self.detect_encoding(file_path)
-            with open(file_path, 'r', encoding=encoding) as file:
-                reader = csv.reader(file)
-                content = "\n".join([",".join(row) for row in reader])
-            return content
-        elif file_extension in ['.py', '.js', '.java', '.html', '.css', '.cpp', '.c', '.sh', '.sql']:
-            encoding = self.detect_encoding(file_path)
-            with open(file_path, 'r', encoding=encoding) as file:
-                content = file.read()
-            return content
+            if getattr(self.conversation_manager, 'config', {}).get("CSV_PROFILE_MODE", True):
+                return self._iter_csv_profile(file_path)
+            return self._iter_csv_rows(file_path, chunk_size)
+        elif file_extension in TEXT_EXTENSIONS:
+            return self._iter_text(file_path, chunk_size)
         else:
-            raise ValueError(f"Unsupported file type: {file_extension}")
\ No newline at end of file
+            raise ValueError(f"Unsupported file type: {file_extension}")
+
+    def _iter_text(self, file_path, chunk_size):
+        """
+        Decode the file incrementally, so multi-byte characters split across reads stay intact.
+        """
+        encoding = self.detect_encoding(file_path)
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        with open(file_path, 'rb') as file:
+            while True:
+                block = file.read(chunk_size)
+                text = decoder.decode(block, final=not block)
+                if text:
+                    yield text
+                if not block:
+                    break
+
+    def _iter_csv_profile(self, file_path):
+        """
+        Yield a compact profile of the table (schema, types, statistics and a sample)
+        instead of its rows, computed in one streaming pass.
+        """
+        from .csv_profiler import CsvProfiler, format_profile
+        config = getattr(self.conversation_manager, 'config', {})
+        profiler = CsvProfiler(
+            block_rows=config.get("CSV_PROFILE_BLOCK_ROWS", 50000),
+            sample_rows=config.get("CSV_PROFILE_SAMPLE_ROWS", 5),
+        )
+        yield format_profile(profiler.profile(file_path, encoding=self.detect_encoding(file_path)))
+
+    def _iter_csv_rows(self, file_path, chunk_size):
+        encoding = self.detect_encoding(file_path)
+        with open(file_path, 'r', encoding=encoding, errors='replace', newline='') as file:
+            lines = []
+            size = 0
+            for index, row in enumerate(csv.reader(file)):
+                line = ",".join(row) if index == 0 else "\n" + ",".join(row)
+                lines.append(line)
+                size += len(line)
+                if size >= chunk_size:
+                    yield "".join(lines)
+                    lines = []
+                    size = 0
+            if lines:
+                yield "".join(lines)
+
+    def _iter_pdf_pages(self, file_path):
+        for text in self.get_pdf_extractor().iter_pages(file_path):
+            if text:
+                yield text
+
+    def get_pdf_extractor(self):
+        """
+        Return the PDF extractor, configured from PDF_WORKERS and PDF_PAGES_PER_TASK in config.json.
+        PDF_WORKERS of 0 uses one worker per CPU and 1 extracts serially.
+        """
+        if self.pdf_extractor is None:
+            from .pdf_extract import PdfExtractor
+            config = getattr(self.conversation_manager, 'config', {})
+            self.pdf_extractor = PdfExtractor(
+                workers=config.get("PDF_WORKERS", 0),
+                pages_per_task=config.get("PDF_PAGES_PER_TASK", 8),
+            )
+        return self.pdf_extractor
+
+    def _iter_docx_paragraphs(self, file_path, chunk_size):
+        import docx
+        doc = docx.Document(file_path)
+        paragraphs = []
+        size = 0
+        for index, para in enumerate(doc.paragraphs):
+            text = para.text if index == 0 else "\n" + para.text
+            paragraphs.append(text)
+            size += len(text)
+            if size >= chunk_size:
+                yield "".join(paragraphs)
+                paragraphs = []
+                size = 0
+        if paragraphs:
+            yield "".join(paragraphs)
\ No newline at end of file
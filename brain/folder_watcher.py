@@ -0,0 +1,174 @@
+import os
+import time
+import queue
+import threading
+import logging
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+from .cancellation import CancelToken, RequestCancelled
+from .file_picker import TEXT_EXTENSIONS
+from .ingestion_cache import hash_file
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+SUPPORTED_EXTENSIONS = set(TEXT_EXTENSIONS) | {".pdf", ".docx", ".csv"}
+
+class WatchedFolderEventHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.schedule(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.schedule(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.schedule(event.dest_path)
+
+class FolderWatcher:
+    def __init__(self, conversation_manager, folder, debounce_seconds=2.0, recursive=True):
+        """
+        Ingest new and changed files of a folder into the conversation memory in the background.
+
+        File system events only mark a path as pending; a path is queued once no event has
+        arrived for it for debounce_seconds, so a file being written is processed once, after
+        the last write. A single worker thread takes paths off the queue and runs them through
+        FilePicker.process_file, skipping files whose content hash is already part of the
+        conversation. Nothing here runs on the UI thread.
+        """
+        self.conversation_manager = conversation_manager
+        self.folder = os.path.abspath(folder)
+        self.debounce_seconds = debounce_seconds
+        self.recursive = recursive
+        self.pending = {}  # Path -> monotonic time of its last event
+        self.condition = threading.Condition()
+        self.work = queue.Queue()
+        self.cancel_token = CancelToken()
+        self.observer = None
+        self.threads = []
+        self.running = False
+        self.ingested = 0
+        self.skipped = 0
+
+    def start(self):
+        """
+        Start watching, and queue the folder's existing files for an initial sync.
+        """
+        if self.running:
+            return
+        if not os.path.isdir(self.folder):
+            logging.error(f"Watched folder does not exist: {self.folder}")
+            return
+        self.running = True
+        self.threads = [
+            threading.Thread(target=self._debounce_loop, name="folder-watcher-debounce", daemon=True),
+            threading.Thread(target=self._work_loop, name="folder-watcher-worker", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+        self.observer = Observer()
+        self.observer.daemon = True
+        self.observer.schedule(WatchedFolderEventHandler(self), self.folder, recursive=self.recursive)
+        self.observer.start()
+        self.resync()
+        logging.info(f"Watching {self.folder} for new and changed files.")
+
+    def resync(self):
+        """
+        Queue every supported file of the folder; unchanged ones are skipped by their hash.
+        The folder is scanned on the worker thread.
+        """
+        self.work.put(self._scan)
+
+    def schedule(self, path):
+        """
+        Mark a path as changed. It is queued once it has been quiet for debounce_seconds.
+        """
+        if os.path.splitext(path)[1].lower() not in SUPPORTED_EXTENSIONS:
+            return
+        with self.condition:
+            self.pending[os.path.abspath(path)] = time.monotonic()
+            self.condition.notify()
+
+    def cancel_current(self):
+        """
+        Abort the file being processed, e.g. before the conversation is cleared.
+        """
+        token, self.cancel_token = self.cancel_token, CancelToken()
+        token.cancel()
+
+    def stop(self, timeout=5.0):
+        if not self.running:
+            return
+        self.running = False
+        if self.observer is not None:
+            self.observer.stop()
+        self.cancel_current()
+        with self.condition:
+            self.condition.notify()
+        self.work.put(None)
+        for thread in self.threads:
+            thread.join(timeout)
+        if self.observer is not None:
+            self.observer.join(timeout)
+            self.observer = None
+
+    def stats(self):
+        return {"pending": len(self.pending), "queued": self.work.qsize(), "ingested": self.ingested, "skipped": self.skipped}
+
+    def _scan(self):
+        for root, dirs, files in os.walk(self.folder):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                    self.work.put(os.path.join(root, name))
+            if not self.recursive:
+                break
+
+    def _debounce_loop(self):
+        with self.condition:
+            while self.running:
+                now = time.monotonic()
+                due = [path for path, last_event in self.pending.items() if now - last_event >= self.debounce_seconds]
+                for path in due:
+                    del self.pending[path]
+                    self.work.put(path)
+                if self.pending:
+                    next_due = min(self.pending.values()) + self.debounce_seconds
+                    self.condition.wait(max(0.0, next_due - now))
+                else:
+                    self.condition.wait()
+
+    def _work_loop(self):
+        while True:
+            item = self.work.get()
+            if item is None or not self.running:
+                break
+            try:
+                if callable(item):
+                    item()
+                else:
+                    self._ingest(item)
+            except RequestCancelled:
+                logging.info(f"Stopped ingesting {item}.")
+            except Exception as e:
+                logging.error(f"Error ingesting {item}: {str(e)}")
+
+    def _ingest(self, path):
+        if not os.path.isfile(path):
+            return
+        manager = self.conversation_manager
+        cache = manager.ingestion_cache
+        content_hash = cache.content_hash(path) if cache is not None else hash_file(path)
+        if manager.store.find_upload(content_hash) is not None:
+            self.skipped += 1
+            logging.debug(f"Skipped unchanged file {path}.")
+            return
+        start = time.perf_counter()
+        manager.file_picker.process_file(path, cancel_token=self.cancel_token)
+        self.ingested += 1
+        logging.info(f"Ingested {os.path.basename(path)} from the watched folder in {time.perf_counter() - start:.2f}s.")
\ No newline at end of file
@@ -0,0 +1,199 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+import numpy as np
+from .conversation_store import encode_embedding, decode_embedding
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+HASH_BLOCK_BYTES = 1024 * 1024
+
+CREATE_FILES = '''CREATE TABLE IF NOT EXISTS files (
+        path TEXT PRIMARY KEY,
+        size INTEGER,
+        mtime_ns INTEGER,
+        content_hash TEXT
+    )'''
+CREATE_DOCUMENTS = '''CREATE TABLE IF NOT EXISTS documents (
+        content_hash TEXT PRIMARY KEY,
+        name TEXT,
+        summary TEXT,
+        created_at REAL,
+        last_used_at REAL
+    )'''
+CREATE_CHUNKS = '''CREATE TABLE IF NOT EXISTS chunks (
+        content_hash TEXT,
+        chunk_index INTEGER,
+        content TEXT,
+        embedding_vector BLOB,
+        PRIMARY KEY (content_hash, chunk_index)
+    )'''
+CREATE_LAST_USED_INDEX = "CREATE INDEX IF NOT EXISTS idx_documents_last_used ON documents (last_used_at)"
+SELECT_FILE = "SELECT size, mtime_ns, content_hash FROM files WHERE path = ?"
+UPSERT_FILE = "INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)"
+SELECT_DOCUMENT = "SELECT name, summary FROM documents WHERE content_hash = ?"
+SELECT_CHUNKS = "SELECT content, embedding_vector FROM chunks WHERE content_hash = ? ORDER BY chunk_index ASC"
+TOUCH_DOCUMENT = "UPDATE documents SET last_used_at = ? WHERE content_hash = ?"
+UPSERT_DOCUMENT = '''INSERT OR REPLACE INTO documents (content_hash, name, summary, created_at, last_used_at)
+                     VALUES (?, ?, ?, ?, ?)'''
+INSERT_CHUNK = "INSERT INTO chunks (content_hash, chunk_index, content, embedding_vector) VALUES (?, ?, ?, ?)"
+SELECT_LEAST_RECENTLY_USED = "SELECT content_hash FROM documents ORDER BY last_used_at ASC LIMIT ?"
+
+
+def hash_file(file_path):
+    """
+    Return the SHA-256 hex digest of a file's content, read in fixed-size blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestionCache:
+    def __init__(self, db_path, max_documents=200):
+        """
+        On-disk cache of processed uploads in SQLite, shared by all conversations.
+
+        Documents are keyed by the SHA-256 of their content and keep the model's summary
+        and the extracted text as retrieval chunks with their embeddings. The hash of a
+        path is remembered with the file's size and mtime, so an unchanged file is not
+        even re-read. The least recently used documents beyond max_documents are evicted.
+        """
+        self.db_path = db_path
+        self.max_documents = max_documents
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(CREATE_FILES)
+        self.conn.execute(CREATE_DOCUMENTS)
+        self.conn.execute(CREATE_CHUNKS)
+        self.conn.execute(CREATE_LAST_USED_INDEX)
+        self.hits = 0
+        self.misses = 0
+
+    def content_hash(self, file_path):
+        """
+        Return the content hash of a file, reusing the stored one if its size and mtime are unchanged.
+        """
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        with self.lock:
+            row = self.conn.execute(SELECT_FILE, (path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        content_hash = hash_file(path)
+        with self.lock:
+            self.conn.execute(UPSERT_FILE, (path, stat.st_size, stat.st_mtime_ns, content_hash))
+        return content_hash
+
+    def get(self, content_hash):
+        """
+        Return the cached document as a dict with name, summary, chunks and embeddings
+        (a float32 matrix, or None if any chunk has no embedding), or None if it is not cached.
+        """
+        with self.lock:
+            document = self.conn.execute(SELECT_DOCUMENT, (content_hash,)).fetchone()
+            if document is None:
+                self.misses += 1
+                return None
+            rows = self.conn.execute(SELECT_CHUNKS, (content_hash,)).fetchall()
+            self.conn.execute(TOUCH_DOCUMENT, (time.time(), content_hash))
+            self.hits += 1
+        chunks = [content for content, _ in rows]
+        vectors = [decode_embedding(blob) for _, blob in rows]
+        embeddings = None
+        if vectors and all(vector is not None for vector in vectors) and len({len(vector) for vector in vectors}) == 1:
+            embeddings = np.vstack(vectors)
+        return {"name": document[0], "summary": document[1], "chunks": chunks, "embeddings": embeddings}
+
+    def put(self, content_hash, name, summary, chunks=None, embeddings=None):
+        """
+        Store a processed document, replacing any previous entry for the same content.
+        If chunks is None, the chunks already stored with put_chunks are kept.
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                if chunks is not None:
+                    self.conn.execute("DELETE FROM chunks WHERE content_hash = ?", (content_hash,))
+                    self.conn.executemany(INSERT_CHUNK, self._chunk_rows(content_hash, chunks, embeddings))
+                self.conn.execute(UPSERT_DOCUMENT, (content_hash, name, summary, now, now))
+                overflow = self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] - self.max_documents
+                if overflow > 0:
+                    evicted = [row[0] for row in self.conn.execute(SELECT_LEAST_RECENTLY_USED, (overflow,)).fetchall()]
+                    self.conn.executemany("DELETE FROM chunks WHERE content_hash = ?", [(key,) for key in evicted])
+                    self.conn.executemany("DELETE FROM documents WHERE content_hash = ?", [(key,) for key in evicted])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def put_chunks(self, content_hash, chunks, embeddings=None, start_index=0):
+        """
+        Store a batch of a document's chunks, numbered from start_index, ahead of its put.
+        The first batch (start_index 0) replaces any chunks stored before for the same content.
+        """
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                if start_index == 0:
+                    self.conn.execute("DELETE FROM chunks WHERE content_hash = ?", (content_hash,))
+                self.conn.executemany(INSERT_CHUNK, self._chunk_rows(content_hash, chunks, embeddings, start_index))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _chunk_rows(self, content_hash, chunks, embeddings, start_index=0):
+        return [
+            (content_hash, start_index + offset, chunk, encode_embedding(embeddings[offset]) if embeddings is not None else None)
+            for offset, chunk in enumerate(chunks)
+        ]
+
+    def remove(self, content_hash):
+        """
+        Forget one document and its chunks, e.g. those of an upload that did not complete.
+        """
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.execute("DELETE FROM chunks WHERE content_hash = ?", (content_hash,))
+                self.conn.execute("DELETE FROM documents WHERE content_hash = ?", (content_hash,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def clear(self):
+        """
+        Forget every cached document and file hash.
+        """
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.execute("DELETE FROM chunks")
+                self.conn.execute("DELETE FROM documents")
+                self.conn.execute("DELETE FROM files")
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def stats(self):
+        with self.lock:
+            documents = self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            return {"documents": documents, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
\ No newline at end of file
@@ -1,84 +1,431 @@
 import os
 import logging
-from gensim.models import Word2Vec
-from gensim.utils import simple_preprocess
+import re
+import copy
+import glob
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 import numpy as np
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# Same tokens as gensim's simple_preprocess: maximal alphabetic runs of 2-15 characters not starting with "_"
+WORD_PATTERN = re.compile(r"(?<![^\W\d])(?!_)[^\W\d]{2,15}(?![^\W\d])")
+
+# Batches of ASCII text are tokenized with str.translate and str.split instead: every ASCII character
+# that cannot be part of a token becomes a space, and a separator marks where each sentence ends
+BATCH_SEPARATOR = "\x00"
+ASCII_TOKEN_TABLE = str.maketrans({chr(code): " " for code in range(128) if not (chr(code).isalpha() or chr(code) in "_" + BATCH_SEPARATOR)})
+# Word vectors gathered at once when averaging a batch, sized so a block stays in cache
+AVERAGE_BLOCK_WORDS = 1024
+
+def tokenize(sentence):
+    return WORD_PATTERN.findall(sentence.lower())
+
+def number_words(sentences):
+    """
+    Tokenize a batch of sentences like tokenize and number the distinct words.
+    Returns (unique_words, columns, lengths): the words of every sentence, concatenated, as indices
+    into unique_words, and the word count of each sentence. A sentence without any word counts as
+    the single word of its stripped text.
+
+    The whole batch is lowered, translated and split as one string, so the per-word work left in
+    Python is a dict lookup; sentences that are not plain ASCII are pre-tokenized with tokenize.
+    """
+    cleaned = [sentence if sentence.isascii() and BATCH_SEPARATOR not in sentence else " ".join(tokenize(sentence)) for sentence in sentences]
+    text = BATCH_SEPARATOR.join(cleaned).lower().translate(ASCII_TOKEN_TABLE)
+    words = text.replace(BATCH_SEPARATOR, f" {BATCH_SEPARATOR} ").split()
+    words.append(BATCH_SEPARATOR)
+    unique_words = list(set(words))
+    position_of_word = dict(zip(unique_words, range(len(unique_words))))
+    columns = np.fromiter(map(position_of_word.__getitem__, words), dtype=np.int64, count=len(words))
+
+    # Drop the separators and the words the pattern would not match, checking each distinct word once
+    kept_word = np.fromiter((1 < len(word) < 16 and word[0] != "_" for word in unique_words), dtype=bool, count=len(unique_words))
+    kept = kept_word[columns]
+    lengths = np.diff(np.cumsum(kept)[columns == position_of_word[BATCH_SEPARATOR]], prepend=0)
+    columns = columns[kept]
+
+    empty = np.flatnonzero(lengths == 0)
+    if len(empty):
+        fallback = [position_of_word.setdefault(sentences[position].strip(), len(position_of_word)) for position in empty]
+        unique_words = list(position_of_word)
+        columns = np.insert(columns, (np.cumsum(lengths) - lengths)[empty], fallback)
+        lengths[empty] = 1
+    return unique_words, columns, lengths
+
+@lru_cache(maxsize=65536)
+def oov_vector(word, vector_size):
+    """
+    Deterministic vector for an out-of-vocabulary word, seeded from a hash of the word.
+    Uses the same uniform(-0.5, 0.5) / vector_size range gensim initializes word vectors with.
+    """
+    seed = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+    vector = (np.random.default_rng(seed).random(vector_size, dtype=np.float32) - 0.5) / vector_size
+    vector.flags.writeable = False
+    return vector
+
+def lookup_word_vector(word, stores, vector_size):
+    """
+    Vector of one word from the first (key_to_index, vectors) store that has it, or its OOV vector.
+    """
+    for key_to_index, vectors in stores:
+        index = key_to_index.get(word)
+        if index is not None:
+            return vectors[index]
+    return oov_vector(word, vector_size)
+
+def average_rows(word_vectors, columns, lengths):
+    """
+    Mean of word_vectors[columns] over consecutive runs of the given lengths, one row per run.
+    The words are gathered in blocks of at most AVERAGE_BLOCK_WORDS and summed with np.add.reduceat.
+    """
+    means = np.empty((len(lengths), word_vectors.shape[1]), dtype=np.float32)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    first = 0
+    while first < len(lengths):
+        # Take at least one run, then as many more as fit in the block
+        last = max(int(np.searchsorted(ends, starts[first] + AVERAGE_BLOCK_WORDS, side="right")), first + 1)
+        block_start = starts[first]
+        gathered = word_vectors.take(columns[block_start:ends[last - 1]], axis=0)
+        np.add.reduceat(gathered, starts[first:last] - block_start, axis=0, out=means[first:last])
+        first = last
+    means /= lengths[:, None]
+    return means
+
+# Shared base vectors, loaded memory-mapped once per process and keyed by path
+_base_vectors = {}
+_base_vectors_lock = threading.Lock()
+
+def load_base_vectors(path, seed_model_path=None, vector_size=100, overlay_paths=()):
+    """
+    Load the shared base KeyedVectors read-only and memory-mapped, creating the store first if needed.
+
+    How the base is built: a new store is seeded from the vectors of seed_model_path (a trained
+    Word2Vec model, e.g. BASE_SEED_MODEL_PATH in config.json) when one is given, otherwise it
+    starts empty. Before the store is mapped for the first time in a process, the vocabularies
+    of the given conversation overlays are merged into it (see consolidate_base_vectors), so
+    the base grows with every finished conversation.
+    """
+    from gensim.models import Word2Vec, KeyedVectors
+    with _base_vectors_lock:
+        if path in _base_vectors:
+            return _base_vectors[path]
+        if not os.path.exists(path):
+            if seed_model_path and os.path.exists(seed_model_path):
+                logging.info(f"Creating base word vectors from {seed_model_path}.")
+                base = Word2Vec.load(seed_model_path).wv
+            else:
+                logging.info("Creating empty base word vectors.")
+                base = KeyedVectors(vector_size)
+            # Vectors are stored in their own .npy file so they can be memory-mapped
+            base.save(path, separately=["vectors"])
+        if overlay_paths:
+            try:
+                consolidate_base_vectors(path, overlay_paths)
+            except Exception as e:
+                logging.error(f"Error consolidating base word vectors: {str(e)}")
+        base = KeyedVectors.load(path, mmap="r")
+        _base_vectors[path] = base
+        return base
+
+def consolidate_base_vectors(path, overlay_paths):
+    """
+    Merge the vocabularies of conversation overlay models into the base store at path.
+
+    Words missing from the base are appended with the mean of their vectors across the
+    overlays. Words already in the base keep their row, and overlays were trained with those
+    rows locked, so the appended vectors live in the same space. Merged overlays are recorded
+    with their mtime in path + ".merged.json" and skipped until they change.
+
+    The new store is written to temporary files and swapped in with os.replace, vectors file
+    first: since rows are only ever appended, a reader sees either the old store or the old
+    index over the new vectors, whose rows it indexes are unchanged. Call this before the
+    store is memory-mapped by this process, as a mapped file cannot be replaced on Windows.
+
+    Returns:
+        int: The number of words added to the base.
+    """
+    from gensim.models import Word2Vec, KeyedVectors
+    manifest_path = path + ".merged.json"
+    merged = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+            merged = json.load(manifest_file)
+    # Forget overlays whose conversation has been removed
+    manifest = {overlay_path: mtime for overlay_path, mtime in merged.items() if os.path.exists(overlay_path)}
+
+    base = KeyedVectors.load(path)
+    sums = {}
+    counts = {}
+    for overlay_path in overlay_paths:
+        overlay_path = os.path.abspath(overlay_path)
+        try:
+            mtime = os.stat(overlay_path).st_mtime_ns
+            if manifest.get(overlay_path) == mtime:
+                continue
+            overlay = Word2Vec.load(overlay_path).wv
+        except Exception as e:
+            logging.error(f"Error loading overlay {overlay_path}: {str(e)}")
+            continue
+        manifest[overlay_path] = mtime
+        if overlay.vector_size != base.vector_size:
+            logging.warning(f"Skipped overlay {overlay_path}: vector size {overlay.vector_size}, base has {base.vector_size}.")
+            continue
+        for word, index in overlay.key_to_index.items():
+            if word in base.key_to_index:
+                continue
+            if word in sums:
+                sums[word] += overlay.vectors[index]
+                counts[word] += 1
+            else:
+                sums[word] = overlay.vectors[index].astype(np.float32)
+                counts[word] = 1
+
+    if sums:
+        words = list(sums)
+        base.add_vectors(words, np.vstack([sums[word] / counts[word] for word in words]).astype(np.float32))
+        temp_path = path + ".tmp"
+        base.save(temp_path, separately=["vectors"])
+        os.replace(temp_path + ".vectors.npy", path + ".vectors.npy")
+        os.replace(temp_path, path)
+        logging.info(f"Added {len(words)} words from conversation overlays to the base word vectors.")
+    if manifest != merged:
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.replace(manifest_path + ".tmp", manifest_path)
+    return len(sums)
+
 class MemoryHandler:
-    def __init__(self, memory_dir):
+    def __init__(self, memory_dir, base_vectors_path=None, training_batch_size=32, training_max_wait_seconds=30.0, embedding_cache_size=4096,
+                 base_seed_model_path=None, consolidate_overlays=True):
         """
         Initialize the MemoryHandler with a specific memory directory.
-        The Word2Vec model will be saved in the conversation-specific subfolder.
+
+        Word vectors come from a shared, memory-mapped base store plus a small per-conversation
+        overlay model that only holds the words learned in this conversation. The overlay is
+        saved in the conversation-specific subfolder. Both are loaded on first use; unless
+        consolidate_overlays is False, the overlays of the other conversations next to this
+        one are merged into the base first.
         """
         self.memory_dir = memory_dir
         self.model_path = os.path.join(self.memory_dir, "word2vec.model")  # Model path is now conversation-specific
-        self.word2vec_model = None
-        self.load_or_train_word2vec_model()
+        self.base_vectors_path = base_vectors_path or os.path.join(self.memory_dir, "base_vectors.kv")
+        self.base_seed_model_path = base_seed_model_path
+        self.consolidate_overlays = consolidate_overlays
+        self.base_vectors = None
+        self.word2vec_model = None  # Per-conversation overlay; None until the first training batch
+        self.training_batch_size = training_batch_size
+        self.training_max_wait_seconds = training_max_wait_seconds
+        self.trainer = None
+        self.embedding_cache = OrderedDict()  # LRU of text hash -> embedding for the current model
+        self.embedding_cache_size = embedding_cache_size
+        self.cache_lock = threading.Lock()
+        self.load_lock = threading.Lock()
+
+    def ensure_loaded(self):
+        """
+        Load the word vectors the first time they are needed.
+        """
+        if self.base_vectors is None:
+            with self.load_lock:
+                if self.base_vectors is None:
+                    self.load_or_train_word2vec_model()
 
     def load_or_train_word2vec_model(self):
         """
-        Load the Word2Vec model if it exists in the conversation-specific directory, otherwise train a new one.
+        Attach the shared base vectors and load this conversation's overlay model if it exists.
+        A new conversation starts with no overlay; it is created by the first training batch.
         """
+        overlay_paths = []
+        if self.consolidate_overlays:
+            pattern = os.path.join(os.path.dirname(os.path.abspath(self.memory_dir)), "*", "word2vec.model")
+            overlay_paths = [path for path in glob.glob(pattern) if os.path.abspath(path) != os.path.abspath(self.model_path)]
+        base_vectors = load_base_vectors(self.base_vectors_path, self.base_seed_model_path, overlay_paths=overlay_paths)
         if os.path.exists(self.model_path):
-            logging.info("Loading existing Word2Vec model.")
+            from gensim.models import Word2Vec
+            logging.info("Loading existing Word2Vec overlay model.")
             self.word2vec_model = Word2Vec.load(self.model_path)
+        # Assigned last, so a loaded base always comes with its overlay
+        self.base_vectors = base_vectors
+
+    @property
+    def vector_size(self):
+        self.ensure_loaded()
+        return self.base_vectors.vector_size
+
+    def build_trained_model(self, sentences):
+        """
+        Return a new overlay model trained on the tokenized sentences, leaving the live model untouched.
+
+        Words that exist in the base store start from their base vectors and are locked during
+        training, so words learned here end up in the same vector space as the base.
+        """
+        from gensim.models import Word2Vec
+        self.ensure_loaded()
+        if self.word2vec_model is None:
+            model = Word2Vec(vector_size=self.vector_size, window=5, min_count=1, workers=4)
+            model.build_vocab(sentences)
         else:
-            logging.info("Training new Word2Vec model.")
-            # Train a new Word2Vec model with default data
-            sentences = [["default", "sentence", "for", "training"]]
-            self.word2vec_model = Word2Vec(sentences, vector_size=100, window=5, min_count=1, workers=4)
-            self.word2vec_model.save(self.model_path)  # Save the model in the conversation-specific directory
+            model = copy.deepcopy(self.word2vec_model)
+            model.build_vocab(sentences, update=True)
+
+        base_index = np.fromiter(
+            (self.base_vectors.key_to_index.get(word, -1) for word in model.wv.index_to_key),
+            dtype=np.int64,
+            count=len(model.wv.index_to_key),
+        )
+        in_base = base_index >= 0
+        model.wv.vectors[in_base] = self.base_vectors.vectors[base_index[in_base]]
+        model.wv.vectors_lockf = np.where(in_base, 0.0, 1.0).astype(np.float32)
+        model.train(sentences, total_examples=len(sentences), epochs=10)
+        return model
+
+    def save_model(self, model):
+        """
+        Save an overlay model through a temporary file so a crash never leaves a partial model behind.
+        """
+        temp_path = self.model_path + ".tmp"
+        model.save(temp_path, separately=[])
+        os.replace(temp_path, self.model_path)
 
     def train_word2vec(self, chunks):
         """
-        Train Word2Vec on the provided chunks, regardless of whether the model exists.
+        Train the overlay model on the provided chunks synchronously.
         The model is saved in the conversation-specific directory.
         """
-        sentences = [simple_preprocess(chunk) for chunk in chunks]
-        if not self.word2vec_model:
-            # If no model exists, train a new one
-            self.word2vec_model = Word2Vec(sentences, vector_size=100, window=5, min_count=1, workers=4)
-        else:
-            # If a model exists, retrain it on the new chunks
-            self.word2vec_model.build_vocab(sentences, update=True)
-            self.word2vec_model.train(sentences, total_examples=len(sentences), epochs=10)
-        self.word2vec_model.save(self.model_path)  # Save the retrained model in the conversation-specific directory
+        sentences = [words for words in (tokenize(chunk) for chunk in chunks) if words]
+        if not sentences:
+            return
+        model = self.build_trained_model(sentences)
+        self.save_model(model)
+        self.swap_model(model)
         logging.info("Word2Vec model retrained on new file chunks.")
 
+    def enqueue_training(self, chunks):
+        """
+        Queue chunks for retraining on the background trainer instead of training inline.
+        """
+        if self.trainer is None:
+            from .word2vec_trainer import BackgroundTrainer
+            self.trainer = BackgroundTrainer(
+                self,
+                batch_size=self.training_batch_size,
+                max_wait_seconds=self.training_max_wait_seconds,
+            )
+        self.trainer.enqueue(chunks)
+
+    def swap_model(self, model):
+        """
+        Replace the live model in a single assignment, so lookups see either the old or the new model.
+        """
+        self.word2vec_model = model
+        with self.cache_lock:
+            self.embedding_cache.clear()
+
+    def training_stats(self):
+        if self.trainer is None:
+            return {"queue_depth": 0, "trainings": 0, "last_training_seconds": None}
+        return self.trainer.stats()
+
+    def close(self, flush=False):
+        """
+        Stop the background trainer, optionally training on the chunks still queued.
+        """
+        if self.trainer is not None:
+            self.trainer.stop(flush=flush)
+            self.trainer = None
+
     def sentence_to_vec(self, sentence):
         """
         Convert a sentence to a vector using Word2Vec.
         Ensure an embedding is always generated, even for short or single-word messages.
         """
-        if not self.word2vec_model:
-            logging.error("Word2Vec model is not loaded.")
+        vectors = self.sentences_to_vecs([sentence])
+        return None if vectors is None else vectors[0]
+
+    def sentences_to_vecs(self, sentences, use_cache=True):
+        """
+        Convert a list of sentences to a (len(sentences), vector_size) float32 matrix of mean word vectors.
+
+        Vocabulary lookups and averaging are vectorized over the whole batch. Out-of-vocabulary
+        words get deterministic hash-seeded vectors, and results are cached per text unless
+        use_cache is False (e.g. for one-off bulk inputs such as document chunks).
+        """
+        try:
+            self.ensure_loaded()
+        except Exception as e:
+            logging.error(f"Error loading word vectors: {str(e)}")
+        model = self.word2vec_model
+        base = self.base_vectors
+        if base is None:
+            logging.error("Word vectors are not loaded.")
             return None
 
+        vector_size = base.vector_size
+        result = np.zeros((len(sentences), vector_size), dtype=np.float32)
         try:
-            # Preprocess the sentence into words
-            words = simple_preprocess(sentence)
-            if not words:  # If no words are found, use the entire sentence as a single word
-                words = [sentence.strip()]
-
-            # Generate vectors for each word in the sentence
-            vectors = []
-            for word in words:
-                if word in self.word2vec_model.wv:
-                    vectors.append(self.word2vec_model.wv[word])
-                else:
-                    # If the word is not in the vocabulary, generate a random vector
-                    vectors.append(np.random.rand(self.word2vec_model.vector_size))
-
-            if vectors:
-                # Return the average of all word vectors
-                return np.mean(vectors, axis=0)
+            if not use_cache:
+                keys = None
+                missing = list(range(len(sentences)))
+            else:
+                keys = [hashlib.blake2b(sentence.encode("utf-8"), digest_size=16).digest() for sentence in sentences]
+                missing = []
+            with self.cache_lock:
+                for position, key in enumerate(keys or ()):
+                    cached = self.embedding_cache.get(key)
+                    if cached is None:
+                        missing.append(position)
+                    else:
+                        self.embedding_cache.move_to_end(key)
+                        result[position] = cached
+            if not missing:
+                return result
+
+            # Base store first, then the conversation overlay, falling back to deterministic OOV vectors.
+            # Plain ndarray views avoid numpy.memmap's per-index overhead on the base vectors
+            stores = [
+                (keyed_vectors.key_to_index, keyed_vectors.vectors.view(np.ndarray))
+                for keyed_vectors in (base, model.wv if model is not None else None)
+                if keyed_vectors is not None and len(keyed_vectors)
+            ]
+            if len(missing) == 1:
+                # A single sentence skips the batch bookkeeping and looks its words up directly
+                text = sentences[missing[0]]
+                words = tokenize(text) or [text.strip()]
+                means = np.stack([lookup_word_vector(word, stores, vector_size) for word in words]).mean(axis=0, keepdims=True, dtype=np.float32)
             else:
-                # If no valid words are found, return a zero vector
-                logging.warning("No valid words found in the sentence for Word2Vec. Returning a zero vector.")
-                return np.zeros(self.word2vec_model.vector_size)
+                # Preprocess the sentences into words and number them, then gather the vectors of the distinct words
+                unique_words, columns, lengths = number_words([sentences[position] for position in missing])
+                word_vectors = np.empty((len(unique_words), vector_size), dtype=np.float32)
+                unresolved = np.ones(len(unique_words), dtype=bool)
+                for key_to_index, vectors in stores:
+                    candidates = np.flatnonzero(unresolved)
+                    index = np.fromiter((key_to_index.get(unique_words[position], -1) for position in candidates), dtype=np.int64, count=len(candidates))
+                    found = index >= 0
+                    word_vectors[candidates[found]] = vectors[index[found]]
+                    unresolved[candidates[found]] = False
+                for position in np.flatnonzero(unresolved):
+                    word_vectors[position] = oov_vector(unique_words[position], vector_size)
+
+                means = average_rows(word_vectors, columns, lengths)
+            if len(missing) == len(sentences):
+                result = means
+            else:
+                result[missing] = means
+
+            with self.cache_lock:
+                if use_cache and model is self.word2vec_model:
+                    for position, vector in zip(missing, means):
+                        self.embedding_cache[keys[position]] = vector.copy()
+                    while len(self.embedding_cache) > self.embedding_cache_size:
+                        self.embedding_cache.popitem(last=False)
+            return result
         except Exception as e:
-            logging.error(f"Error converting sentence to vector: {str(e)}")
-            return np.zeros(self.word2vec_model.vector_size)
\ No newline at end of file
+            logging.error(f"Error converting sentences to vectors: {str(e)}")
+            return result
\ No newline at end of file
@@ -0,0 +1,161 @@
+import threading
+import numpy as np
+
+class MemoryIndex:
+    def __init__(self):
+        """
+        In-memory cosine similarity index over stored embeddings.
+        Rows are kept L2-normalized in one contiguous float32 matrix, so a search is a single
+        matrix-vector product.
+
+        Writers hold the lock. Readers take a snapshot of ids, matrix and size under it and
+        compute without it: rows below size are never written again (a reset or growth
+        allocates new arrays), so the snapshot stays valid while rows are appended.
+        """
+        self.ids = np.empty(0, dtype=np.int64)
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self.size = 0
+        self.generation = 0  # Bumped whenever existing rows are dropped
+        self.duplicate_cache = None  # (threshold, rows covered, newest near-duplicate position per row, id map)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.size
+
+    def load(self, ids, matrix):
+        """
+        Replace the index contents with the given row ids and embedding matrix.
+        """
+        ids = np.array(ids, dtype=np.int64)
+        matrix = self._normalize(np.array(matrix, dtype=np.float32, ndmin=2))
+        with self.lock:
+            self.ids, self.matrix, self.size = ids, matrix, len(ids)
+            self.generation += 1
+            self.duplicate_cache = None
+
+    def _snapshot(self):
+        with self.lock:
+            return self.ids[:self.size], self.matrix[:self.size], self.size
+
+    def add(self, row_id, embedding):
+        """
+        Append one embedding; storage grows geometrically so appends are amortized O(dim).
+        """
+        vector = self._normalize(np.asarray(embedding, dtype=np.float32).reshape(1, -1))
+        with self.lock:
+            if self.size == 0 or self.matrix.shape[1] != vector.shape[1]:
+                if self.size:
+                    # A model with a different vector size invalidates the old rows
+                    self.size = 0
+                    self.generation += 1
+                    self.duplicate_cache = None
+                self.matrix = np.empty((16, vector.shape[1]), dtype=np.float32)
+                self.ids = np.empty(16, dtype=np.int64)
+            elif self.size == len(self.matrix):
+                self.matrix = np.concatenate([self.matrix, np.empty_like(self.matrix)])
+                self.ids = np.concatenate([self.ids, np.empty_like(self.ids)])
+            self.matrix[self.size] = vector[0]
+            self.ids[self.size] = row_id
+            self.size += 1
+
+    def add_many(self, row_ids, embeddings):
+        """
+        Append a batch of embeddings, growing the storage at most once.
+        """
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(row_ids), -1))
+        if len(vectors) == 0:
+            return
+        with self.lock:
+            if self.size == 0 or self.matrix.shape[1] != vectors.shape[1]:
+                if self.size:
+                    self.size = 0
+                    self.generation += 1
+                    self.duplicate_cache = None
+                self.matrix = np.empty((max(16, len(vectors)), vectors.shape[1]), dtype=np.float32)
+                self.ids = np.empty(len(self.matrix), dtype=np.int64)
+            elif self.size + len(vectors) > len(self.matrix):
+                capacity = max(2 * len(self.matrix), self.size + len(vectors))
+                matrix = np.empty((capacity, self.matrix.shape[1]), dtype=np.float32)
+                ids = np.empty(capacity, dtype=np.int64)
+                matrix[:self.size] = self.matrix[:self.size]
+                ids[:self.size] = self.ids[:self.size]
+                self.matrix, self.ids = matrix, ids
+            self.matrix[self.size:self.size + len(vectors)] = vectors
+            self.ids[self.size:self.size + len(vectors)] = row_ids
+            self.size += len(vectors)
+
+    def search(self, query, top_k, min_similarity=None, exclude_ids=None):
+        """
+        Find the rows most similar to the query embedding.
+
+        Returns:
+            list: (row id, cosine similarity) pairs, best match first.
+        """
+        ids, matrix, size = self._snapshot()
+        if size == 0 or query is None or top_k <= 0:
+            return []
+        query = self._normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        if query.shape[0] != matrix.shape[1]:
+            return []
+
+        scores = matrix @ query
+        if exclude_ids:
+            scores = np.where(np.isin(ids, list(exclude_ids)), -np.inf, scores)
+        if min_similarity is not None:
+            scores = np.where(scores >= min_similarity, scores, -np.inf)
+
+        top_k = min(top_k, size)
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [(int(ids[i]), float(scores[i])) for i in candidates if np.isfinite(scores[i])]
+
+    def near_duplicates(self, threshold, block_size=1024):
+        """
+        Map the id of every row that has a newer near-duplicate (cosine similarity of at least
+        threshold) to the id of its newest near-duplicate.
+
+        The result is cached; when rows have been added since, only the new rows are compared
+        against all rows, one block of block_size x block_size similarities at a time.
+        """
+        with self.lock:
+            ids, matrix, size = self.ids[:self.size], self.matrix[:self.size], self.size
+            cache, generation = self.duplicate_cache, self.generation
+        if cache is not None and cache[0] == threshold and cache[1] == size:
+            return cache[3]
+        if cache is None or cache[0] != threshold or cache[1] > size:
+            covered, newest = 0, np.empty(0, dtype=np.int64)
+        else:
+            covered, newest = cache[1], cache[2]
+
+        newest = np.concatenate([newest, np.full(size - covered, -1, dtype=np.int64)])
+        for start in range(covered, size, block_size):
+            stop = min(start + block_size, size)
+            new_rows = matrix[start:stop]
+            # Only rows older than a new row can be superseded by it
+            for row_start in range(0, stop, block_size):
+                row_stop = min(row_start + block_size, stop)
+                similar = (matrix[row_start:row_stop] @ new_rows.T) >= threshold
+                similar &= np.arange(start, stop)[None, :] > np.arange(row_start, row_stop)[:, None]
+                found = similar.any(axis=1)
+                if not found.any():
+                    continue
+                # Position of the last (newest) similar new row
+                last = start + similar.shape[1] - 1 - np.argmax(similar[:, ::-1], axis=1)
+                block = newest[row_start:row_stop]
+                block[found] = np.maximum(block[found], last[found])
+
+        rows = np.flatnonzero(newest >= 0)
+        mapping = dict(zip(ids[rows].tolist(), ids[newest[rows]].tolist()))
+        with self.lock:
+            # Cache what the snapshot covers, unless its rows were dropped in the meantime
+            if self.generation == generation:
+                self.duplicate_cache = (threshold, size, newest, mapping)
+        return mapping
+
+    @staticmethod
+    def _normalize(matrix):
+        if matrix.size == 0:
+            return matrix
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
\ No newline at end of file
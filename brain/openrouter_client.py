@@ -0,0 +1,351 @@
+import time
+import queue
+import asyncio
+import threading
+import logging
+import concurrent.futures
+from .cancellation import RequestCancelled
+from .response_cache import cache_key
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+EXTRA_HEADERS = {"HTTP-Referer": "your_site_url", "X-Title": "your_app_name"}
+
+_END_OF_STREAM = object()
+# Settings of the connection pool; changing one rebuilds the AsyncOpenAI client
+POOL_SETTINGS = ("max_connections", "max_keepalive_connections", "keepalive_expiry", "timeout_seconds", "connect_timeout_seconds", "max_retries")
+
+class OpenRouterClient:
+    def __init__(self, max_concurrency=8, max_connections=16, max_keepalive_connections=8,
+                 keepalive_expiry=120.0, timeout_seconds=120.0, connect_timeout_seconds=10.0, max_retries=2,
+                 cache=None):
+        """
+        One shared async OpenRouter client for the whole brain, with a synchronous facade.
+
+        A single AsyncOpenAI client runs on a dedicated event loop thread, so chat, summary and
+        retrieval requests from any thread reuse its pool of keep-alive connections instead of
+        each paying for a new TLS handshake. A semaphore bounds the requests in flight, and
+        every request has a timeout. chat_completion() and stream() block the calling thread
+        like the old synchronous client did, and both honour a CancelToken.
+
+        With a ResponseCache, identical requests are answered from the cache or share the
+        call already in flight, unless the call passes use_cache=False.
+        """
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout_seconds = timeout_seconds
+        self.connect_timeout_seconds = connect_timeout_seconds
+        self.max_retries = max_retries
+        self.cache = cache
+        self.api_key = None
+        self.client = None  # AsyncOpenAI, only used on the loop thread
+        self.loop = None
+        self.thread = None
+        self.semaphore = None
+        self.retired_clients = []  # Replaced clients, closed once no request uses them; loop thread only
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def set_api_key(self, api_key):
+        """
+        Use a new API key; the client is rebuilt on the next request.
+        """
+        with self.lock:
+            if api_key == self.api_key:
+                return
+            self.api_key = api_key
+            old_client, self.client = self.client, None
+        self._retire(old_client)
+
+    def configure(self, **settings):
+        """
+        Change the limits given to the constructor on the live client, e.g. from config.json.
+
+        A new max_concurrency applies to requests that have not started yet. A changed pool
+        setting rebuilds the client on the next request; the old one is closed once the
+        requests still using it have finished.
+        """
+        unknown = set(settings) - set(POOL_SETTINGS) - {"max_concurrency"}
+        if unknown:
+            raise TypeError(f"Unknown OpenRouter client settings: {', '.join(sorted(unknown))}")
+        old_client = None
+        with self.lock:
+            changed = {name for name, value in settings.items() if getattr(self, name) != value}
+            if not changed:
+                return
+            for name in changed:
+                setattr(self, name, settings[name])
+            if "max_concurrency" in changed:
+                # Created again on the loop thread by the next request
+                self.semaphore = None
+            if changed & set(POOL_SETTINGS):
+                old_client, self.client = self.client, None
+        self._retire(old_client)
+        logging.info(f"OpenRouter client settings changed: {', '.join(sorted(changed))}.")
+
+    def _retire(self, client):
+        """
+        Close a replaced AsyncOpenAI client without aborting the requests still using it.
+        """
+        if client is None:
+            return
+
+        def retire():
+            self.retired_clients.append(client)
+            if self.in_flight == 0:
+                self._close_retired_clients()
+
+        self.loop.call_soon_threadsafe(retire)
+
+    def _close_retired_clients(self):
+        clients, self.retired_clients = self.retired_clients, []
+        for client in clients:
+            self.loop.create_task(client.close())
+
+    def start(self):
+        """
+        Start the event loop thread if it is not running yet.
+        """
+        with self.lock:
+            if self.thread is not None:
+                return
+            ready = threading.Event()
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self._run_loop, args=(ready,), name="openrouter-client", daemon=True)
+            self.thread.start()
+        ready.wait()
+
+    def warm_up(self):
+        """
+        Start the loop and build the client ahead of the first request.
+        """
+        self.start()
+
+        async def build():
+            self._get_async_client()
+
+        asyncio.run_coroutine_threadsafe(build(), self.loop).result()
+
+    def _run_loop(self, ready):
+        asyncio.set_event_loop(self.loop)
+        ready.set()
+        self.loop.run_forever()
+
+    def _get_async_client(self):
+        """
+        Return the AsyncOpenAI client, creating it on first use. Runs on the loop thread.
+        """
+        if self.client is None:
+            import httpx
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+            if not self.api_key:
+                raise ValueError("The OpenRouter API key is not set.")
+            http_client = DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(self.timeout_seconds, connect=self.connect_timeout_seconds),
+            )
+            self.client = AsyncOpenAI(
+                base_url=OPENROUTER_BASE_URL,
+                api_key=self.api_key,
+                http_client=http_client,
+                max_retries=self.max_retries,
+            )
+            logging.info("OpenRouter client created.")
+        return self.client
+
+    async def _acquire(self):
+        """
+        Wait for a free request slot and return the semaphore it was taken from.
+        """
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        semaphore = self.semaphore
+        await semaphore.acquire()
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return semaphore
+
+    def _release(self, semaphore):
+        self.in_flight -= 1
+        semaphore.release()
+        if self.in_flight == 0 and self.retired_clients:
+            self._close_retired_clients()
+
+    async def _complete(self, params, timeout):
+        semaphore = await self._acquire()
+        try:
+            return await self._get_async_client().chat.completions.create(
+                **params, timeout=timeout, extra_headers=EXTRA_HEADERS,
+            )
+        finally:
+            self._release(semaphore)
+
+    async def _stream(self, params, timeout, deltas):
+        semaphore = await self._acquire()
+        try:
+            stream = await self._get_async_client().chat.completions.create(
+                **params, stream=True, timeout=timeout, extra_headers=EXTRA_HEADERS,
+            )
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        deltas.put(chunk.choices[0].delta.content)
+            finally:
+                await stream.close()
+        finally:
+            self._release(semaphore)
+
+    def _submit(self, coroutine, cancel_token):
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        if cancel_token is not None:
+            cancel_token.on_cancel(future.cancel)
+        return future
+
+    def chat_completion(self, model, messages, timeout=None, cancel_token=None, use_cache=True, **params):
+        """
+        Run a chat completion and block until it finishes.
+
+        Raises:
+            RequestCancelled: If cancel_token was cancelled; the HTTP request is aborted.
+        """
+        if self.cache is None or not use_cache:
+            return self._chat_completion(model, messages, timeout, cancel_token, params)
+
+        from openai.types.chat import ChatCompletion
+        key = cache_key(model, messages, params)
+        response = self.cache.get_or_fetch(
+            key,
+            model,
+            lambda: self._chat_completion(model, messages, timeout, cancel_token, params).model_dump(mode="json"),
+            cancel_token,
+        )
+        logging.debug(f"Response cache: {self.cache.stats()}")
+        return ChatCompletion.model_validate(response)
+
+    def _chat_completion(self, model, messages, timeout, cancel_token, params):
+        params = dict(params, model=model, messages=messages)
+        future = self._submit(self._complete(params, timeout or self.timeout_seconds), cancel_token)
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            raise RequestCancelled()
+
+    def stream(self, model, messages, timeout=None, cancel_token=None, use_cache=True, **params):
+        """
+        Stream a chat completion, yielding text deltas as they arrive.
+        Closing the generator early or cancelling cancel_token aborts the HTTP stream.
+
+        A cached response (or one shared with an identical request in flight) is yielded
+        as a single delta.
+        """
+        if self.cache is None or not use_cache:
+            yield from self._stream_deltas(model, messages, timeout, cancel_token, params)
+            return
+
+        key = cache_key(model, messages, params)
+        response, ticket = self.cache.claim(key, cancel_token)
+        if ticket is None:
+            logging.debug(f"Response cache: {self.cache.stats()}")
+            content = response["choices"][0]["message"]["content"]
+            if content:
+                yield content
+            return
+
+        parts = []
+        try:
+            for delta in self._stream_deltas(model, messages, timeout, cancel_token, params):
+                parts.append(delta)
+                yield delta
+        except GeneratorExit:
+            # Closed early by the caller; waiting callers retry on their own
+            self.cache.abandon(key, ticket, RequestCancelled())
+            raise
+        except BaseException as e:
+            self.cache.abandon(key, ticket, e)
+            raise
+        if not parts:
+            self.cache.abandon(key, ticket, ValueError("The stream ended without any content."))
+            return
+        self.cache.complete(key, model, ticket, {
+            "id": "stream",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(parts)}, "finish_reason": "stop"}],
+        })
+        logging.debug(f"Response cache: {self.cache.stats()}")
+
+    def _stream_deltas(self, model, messages, timeout, cancel_token, params):
+        params = dict(params, model=model, messages=messages)
+        deltas = queue.Queue()
+        future = self._submit(self._stream(params, timeout or self.timeout_seconds, deltas), cancel_token)
+        # Runs however the coroutine ends, including a cancel before it started
+        future.add_done_callback(lambda _: deltas.put(_END_OF_STREAM))
+        try:
+            while True:
+                delta = deltas.get()
+                if delta is _END_OF_STREAM:
+                    break
+                yield delta
+            future.result()
+        except concurrent.futures.CancelledError:
+            raise RequestCancelled()
+        finally:
+            future.cancel()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "max_concurrency": self.max_concurrency,
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+    def close(self, timeout=5.0):
+        """
+        Close the pooled connections and stop the event loop thread.
+        """
+        with self.lock:
+            thread, client = self.thread, self.client
+            self.thread = None
+            self.client = None
+        if thread is None:
+            return
+        start = time.perf_counter()
+        if client is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(client.close(), self.loop).result(timeout)
+            except Exception as e:
+                logging.warning(f"Error closing the OpenRouter client: {str(e)}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        thread.join(max(0.0, timeout - (time.perf_counter() - start)))
+
+# The client shared by every part of the brain
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+def get_openrouter_client(**settings):
+    """
+    Return the shared OpenRouterClient. Settings passed here are applied whether or not it
+    already exists; callers without settings get the client as last configured.
+    """
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = OpenRouterClient(**settings)
+        elif settings:
+            _shared_client.configure(**settings)
+        return _shared_client
\ No newline at end of file
@@ -0,0 +1,92 @@
+import os
+import time
+import logging
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+def count_pages(file_path):
+    import PyPDF2
+    with open(file_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+def extract_page_range(file_path, start, stop):
+    """
+    Extract the text of pages [start, stop). Runs in a worker process, which opens the PDF itself.
+    """
+    import PyPDF2
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        return [reader.pages[index].extract_text() or "" for index in range(start, stop)]
+
+class PdfExtractor:
+    def __init__(self, workers=None, pages_per_task=8, min_parallel_pages=16):
+        """
+        Extract PDF text with page ranges spread across a process pool.
+
+        Ranges of pages_per_task pages are extracted in worker processes and yielded back in
+        page order, with only a few ranges in flight per worker so memory stays bounded.
+        Small documents (under min_parallel_pages), workers <= 1, or a pool that cannot
+        be started or breaks, fall back to serial extraction in this process.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.pages_per_task = max(1, pages_per_task)
+        self.min_parallel_pages = min_parallel_pages
+        self.last_stats = None
+
+    def iter_pages(self, file_path):
+        """
+        Yield the text of every page of the PDF, in order.
+        """
+        start_time = time.perf_counter()
+        page_count = count_pages(file_path)
+        ranges = [(start, min(start + self.pages_per_task, page_count)) for start in range(0, page_count, self.pages_per_task)]
+        mode = "serial"
+        done = 0  # Ranges already yielded
+
+        if self.workers > 1 and page_count >= self.min_parallel_pages:
+            mode = "parallel"
+            try:
+                for texts in self._iter_parallel(file_path, ranges):
+                    done += 1
+                    yield from texts
+            except (BrokenProcessPool, OSError, RuntimeError) as e:
+                logging.warning(f"Parallel PDF extraction failed ({str(e)}); continuing serially.")
+                mode = "serial fallback"
+
+        if done < len(ranges):
+            # A single reader for the rest, so the document is only parsed once
+            yield from extract_page_range(file_path, ranges[done][0], page_count)
+
+        elapsed = time.perf_counter() - start_time
+        self.last_stats = {
+            "pages": page_count,
+            "seconds": elapsed,
+            "pages_per_second": page_count / elapsed if elapsed > 0 else 0.0,
+            "mode": mode,
+            "workers": self.workers if mode == "parallel" else 1,
+        }
+        logging.info(
+            f"Extracted {page_count} PDF pages in {elapsed:.2f}s "
+            f"({self.last_stats['pages_per_second']:.1f} pages/sec, {mode}, {self.last_stats['workers']} workers)."
+        )
+
+    def _iter_parallel(self, file_path, ranges):
+        """
+        Yield the page texts of each range in order, keeping at most two ranges per worker in flight.
+        """
+        workers = min(self.workers, len(ranges))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = []
+            next_range = 0
+            try:
+                while next_range < len(ranges) or pending:
+                    while next_range < len(ranges) and len(pending) < workers * 2:
+                        pending.append(pool.submit(extract_page_range, file_path, *ranges[next_range]))
+                        next_range += 1
+                    yield pending.pop(0).result()
+            finally:
+                for future in pending:
+                    future.cancel()
\ No newline at end of file
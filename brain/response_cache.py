@@ -0,0 +1,211 @@
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+import logging
+import concurrent.futures
+from .cancellation import RequestCancelled
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+CREATE_RESPONSES = '''CREATE TABLE IF NOT EXISTS responses (
+        cache_key TEXT PRIMARY KEY,
+        model TEXT,
+        response TEXT,
+        created_at REAL,
+        last_used_at REAL
+    )'''
+CREATE_LAST_USED_INDEX = "CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used_at)"
+SELECT_RESPONSE = "SELECT response, created_at FROM responses WHERE cache_key = ?"
+TOUCH_RESPONSE = "UPDATE responses SET last_used_at = ? WHERE cache_key = ?"
+UPSERT_RESPONSE = '''INSERT OR REPLACE INTO responses (cache_key, model, response, created_at, last_used_at)
+                     VALUES (?, ?, ?, ?, ?)'''
+DELETE_RESPONSE = "DELETE FROM responses WHERE cache_key = ?"
+DELETE_EXPIRED = "DELETE FROM responses WHERE created_at < ?"
+DELETE_LEAST_RECENTLY_USED = '''DELETE FROM responses WHERE cache_key IN
+                                (SELECT cache_key FROM responses ORDER BY last_used_at ASC LIMIT ?)'''
+
+
+def normalize_messages(messages):
+    """
+    Reduce messages to role and content, with line endings unified and trailing whitespace
+    removed, so formatting-only differences map to the same cache key.
+    """
+    normalized = []
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, str):
+            lines = content.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+            content = "\n".join(line.rstrip() for line in lines).strip()
+        normalized.append({"role": message.get("role"), "content": content})
+    return normalized
+
+
+def cache_key(model, messages, params):
+    """
+    Hash of the model, the normalized messages and the request parameters.
+    """
+    payload = json.dumps(
+        {"model": model, "messages": normalize_messages(messages), "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, db_path, ttl_seconds=86400, max_entries=2000):
+        """
+        On-disk cache of model responses in SQLite, with a time-to-live and LRU eviction.
+
+        Identical requests that arrive while one is already in flight wait for it instead of
+        making their own upstream call. Responses are stored as JSON dictionaries.
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(CREATE_RESPONSES)
+        self.conn.execute(CREATE_LAST_USED_INDEX)
+        self.conn.execute(DELETE_EXPIRED, (time.time() - self.ttl_seconds,))
+        self.entry_count = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        self.in_flight = {}  # cache key -> Future of the upstream call
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Return the cached response for key, or None if it is missing or expired.
+        """
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(SELECT_RESPONSE, (key,)).fetchone()
+            if row is None:
+                return None
+            response, created_at = row
+            if created_at < now - self.ttl_seconds:
+                self.conn.execute(DELETE_RESPONSE, (key,))
+                self.entry_count -= 1
+                return None
+            self.conn.execute(TOUCH_RESPONSE, (now, key))
+        return json.loads(response)
+
+    def put(self, key, model, response):
+        """
+        Store a response, evicting the least recently used entries beyond max_entries.
+        """
+        now = time.time()
+        with self.lock:
+            existed = self.conn.execute("SELECT 1 FROM responses WHERE cache_key = ?", (key,)).fetchone() is not None
+            self.conn.execute(UPSERT_RESPONSE, (key, model, json.dumps(response, ensure_ascii=False), now, now))
+            if not existed:
+                self.entry_count += 1
+            overflow = self.entry_count - self.max_entries
+            if overflow > 0:
+                self.conn.execute(DELETE_LEAST_RECENTLY_USED, (overflow,))
+                self.entry_count -= overflow
+                self.evictions += overflow
+
+    def claim(self, key, cancel_token=None):
+        """
+        Look up key, waiting for an identical request that is already in flight.
+
+        Returns:
+            tuple: (response, None) when the response is cached or was just produced by the
+            request in flight, otherwise (None, ticket) and the caller must make the upstream
+            call and pass the ticket to complete() or abandon().
+        """
+        while True:
+            response = self.get(key)
+            if response is not None:
+                with self.lock:
+                    self.hits += 1
+                return response, None
+
+            with self.lock:
+                future = self.in_flight.get(key)
+                if future is None:
+                    ticket = concurrent.futures.Future()
+                    self.in_flight[key] = ticket
+                    self.misses += 1
+                    return None, ticket
+
+            # Wait for the identical request already in flight, watching for our own cancellation
+            while not future.done():
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                concurrent.futures.wait([future], timeout=0.1)
+            if future.exception() is None:
+                with self.lock:
+                    self.coalesced += 1
+                return future.result(), None
+            # The first caller failed; its error is ours too unless it was only cancelled,
+            # in which case try again (possibly making the call ourselves)
+            if not isinstance(future.exception(), RequestCancelled):
+                raise future.exception()
+
+    def complete(self, key, model, ticket, response):
+        """
+        Cache the response of a claimed request and hand it to any callers waiting on it.
+        """
+        try:
+            self.put(key, model, response)
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+            ticket.set_result(response)
+
+    def abandon(self, key, ticket, exception):
+        """
+        Release a claimed request that failed or was cancelled.
+        """
+        with self.lock:
+            self.in_flight.pop(key, None)
+        ticket.set_exception(exception)
+
+    def get_or_fetch(self, key, model, fetch, cancel_token=None):
+        """
+        Return the cached response for key, or call fetch() once for all concurrent callers
+        and cache its result.
+        """
+        response, ticket = self.claim(key, cancel_token)
+        if ticket is None:
+            return response
+        try:
+            response = fetch()
+        except BaseException as e:
+            self.abandon(key, ticket, e)
+            raise
+        self.complete(key, model, ticket, response)
+        return response
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.coalesced + self.misses
+            return {
+                "entries": self.entry_count,
+                "hits": self.hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM responses")
+            self.entry_count = 0
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
\ No newline at end of file
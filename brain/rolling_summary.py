@@ -0,0 +1,146 @@
+import time
+import threading
+import logging
+import concurrent.futures
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+SUMMARY_SYSTEM_PROMPT = "You are an AI assistant that summarizes conversations accurately and concisely."
+FOLD_TURNS_PROMPT = (
+    "Summarize these turns of a conversation between a user and an AI assistant. "
+    "Keep the facts, decisions, names, numbers and open questions that later turns may refer to.\n\n{text}"
+)
+FOLD_SUMMARIES_PROMPT = (
+    "These are summaries of consecutive parts of a conversation between a user and an AI assistant. "
+    "Combine them into one summary that keeps the facts, decisions, names, numbers and open questions.\n\n{text}"
+)
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+
+class RollingSummary:
+    def __init__(self, conversation_manager, fold_threshold=8, keep_recent=4, fan_in=4):
+        """
+        Hierarchical summary of the older turns of a conversation, so the prompt stops growing.
+
+        Once more than keep_recent turns are unsummarized and at least fold_threshold of them
+        can be folded, the oldest fold_threshold turns are summarized into a level 0 summary
+        by a background model call. Whenever fan_in summaries of one level are active, they
+        are combined into one summary of the next level. The prompt then carries at most
+        fan_in - 1 summaries per level plus the unsummarized turns.
+
+        Summaries are stored in the conversation database and only new turns are folded,
+        so the summary is rebuilt incrementally. The active summaries are cached in memory
+        until the next fold.
+        """
+        self.conversation_manager = conversation_manager
+        self.fold_threshold = max(1, fold_threshold)
+        self.keep_recent = keep_recent
+        self.fan_in = max(2, fan_in)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="rolling-summary")
+        self.lock = threading.Lock()
+        self.scheduled = False
+        self.cached = None  # (store, active summary rows, id of the last summarized turn)
+
+    def reset(self):
+        """
+        Drop the cached summaries, e.g. when the conversation changes.
+        """
+        with self.lock:
+            self.cached = None
+
+    def _state(self, store):
+        with self.lock:
+            if self.cached is not None and self.cached[0] is store:
+                return self.cached[1], self.cached[2]
+        summaries = store.fetch_active_summaries()
+        summarized_up_to = store.summarized_up_to()
+        with self.lock:
+            self.cached = (store, summaries, summarized_up_to)
+        return summaries, summarized_up_to
+
+    def context_rows(self):
+        """
+        Return the rows to send instead of the full history.
+
+        Returns:
+            tuple: (summary row or None, unsummarized rows oldest first), both as
+            (id, text, token_count) tuples. The summary row has id 0 so it sorts first.
+        """
+        store = self.conversation_manager.store
+        summaries, summarized_up_to = self._state(store)
+        recent = store.fetch_summaries_after(summarized_up_to)
+        if not summaries:
+            return None, recent
+        text = "\n\n".join([SUMMARY_HEADER] + [row[4] for row in summaries])
+        return (0, text, self.conversation_manager.token_counter.count_message(text)), recent
+
+    def maybe_fold(self):
+        """
+        Schedule a background fold if enough turns are waiting. Never blocks on the model.
+        """
+        store = self.conversation_manager.store
+        _, summarized_up_to = self._state(store)
+        waiting = len(store.fetch_summaries_after(summarized_up_to))
+        if waiting < self.fold_threshold + self.keep_recent:
+            return
+        with self.lock:
+            if self.scheduled:
+                return
+            self.scheduled = True
+        self.executor.submit(self._fold, store)
+
+    def _fold(self, store):
+        try:
+            start = time.perf_counter()
+            folded = 0
+            while store is self.conversation_manager.store:
+                summarized_up_to = store.summarized_up_to()
+                waiting = store.fetch_summaries_after(summarized_up_to)
+                if len(waiting) < self.fold_threshold + self.keep_recent:
+                    break
+                turns = store.fetch_messages_after(summarized_up_to, self.fold_threshold)
+                content = self._summarize(FOLD_TURNS_PROMPT.format(text="\n\n".join(message for _, message in turns)))
+                store.insert_rolling_summary(0, turns[0][0], turns[-1][0], content, self._count(content))
+                folded += len(turns)
+                self._merge_levels(store)
+                self.reset()
+            if folded:
+                logging.info(f"Folded {folded} turns into the rolling summary in {time.perf_counter() - start:.2f}s.")
+        except Exception as e:
+            logging.error(f"Error updating the rolling summary: {str(e)}")
+        finally:
+            with self.lock:
+                self.scheduled = False
+
+    def _merge_levels(self, store):
+        """
+        Combine fan_in active summaries of the same level into one of the next level, repeatedly.
+        """
+        while True:
+            by_level = {}
+            for row in store.fetch_active_summaries():
+                by_level.setdefault(row[1], []).append(row)
+            full = [level for level, rows in sorted(by_level.items()) if len(rows) >= self.fan_in]
+            if not full:
+                return
+            group = by_level[full[0]][:self.fan_in]
+            content = self._summarize(FOLD_SUMMARIES_PROMPT.format(text="\n\n".join(row[4] for row in group)))
+            store.insert_rolling_summary(
+                full[0] + 1, group[0][2], group[-1][3], content, self._count(content), folds=[row[0] for row in group],
+            )
+
+    def _count(self, text):
+        return self.conversation_manager.token_counter.count_message(text)
+
+    def _summarize(self, prompt):
+        manager = self.conversation_manager
+        completion = manager.get_client().chat_completion(
+            model=manager.MODEL_NAME,
+            messages=[
+                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+        )
+        if not completion.choices or not completion.choices[0].message or not completion.choices[0].message.content:
+            raise ValueError("No message found in API response.")
+        return completion.choices[0].message.content.strip()
\ No newline at end of file
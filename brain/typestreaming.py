@@ -1,9 +1,30 @@
 import os
+import io
+import re
 import datetime
 import csv
+import threading
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from openai import OpenAI as Client
+from .openrouter_client import get_openrouter_client
+
+# Quotes and line breaks; a line break outside quotes ends a CSV record.
+# Matched on the raw UTF-8 bytes, in which neither byte can be part of a multibyte character.
+RECORD_BOUNDARY = re.compile(rb'["\n]')
+
+def complete_records(data):
+    """
+    Return the prefix of the bytes that holds only complete CSV records, leaving out a row
+    that is still being written. Line breaks inside quoted fields do not end a record.
+    """
+    end = 0
+    in_quotes = False
+    for match in RECORD_BOUNDARY.finditer(data):
+        if match.group() == b'"':
+            in_quotes = not in_quotes
+        elif not in_quotes:
+            end = match.end()
+    return data[:end]
 
 class ConversationEventHandler(FileSystemEventHandler):
     def __init__(self, manager):
@@ -14,7 +35,7 @@ class ConversationEventHandler(FileSystemEventHandler):
             self.manager.process_new_messages()
 
 class ConversationManager:
-    def __init__(self):
+    def __init__(self, compaction_interval=300):
         self.memory_dir = os.path.join(os.path.dirname(__file__), "Memory")
         os.makedirs(self.memory_dir, exist_ok=True)
         self.conv_folder = None
@@ -25,7 +46,14 @@ class ConversationManager:
         self.OPEN_ROUTER_API_KEY = None
         self.client = None
         self.observer = None
-        self.last_modified_time = None
+        # Append-only reading: bytes of the CSV already parsed, and the file they belong to
+        self.read_offset = 0
+        self.file_id = None
+        self.lock = threading.RLock()
+        self.compaction_interval = compaction_interval
+        self.compaction_timer = None
+        self.compaction_stopped = False  # Set by stop_watching_file; guarded by self.lock
+        self.rows_since_compaction = 0
 
         self.init_conversation()
 
@@ -34,32 +62,62 @@ class ConversationManager:
         self.conv_folder = os.path.join(self.memory_dir, f"memory_{timestamp}")
         os.makedirs(self.conv_folder, exist_ok=True)
         self.conversation_csv_path = os.path.join(self.conv_folder, "conversations.csv")
-        
+        self.read_offset = 0
+        self.file_id = None
+        self.context = []
+        self.unique_entries = set()
+
         if not os.path.exists(self.conversation_csv_path):
             with open(self.conversation_csv_path, "w", encoding='utf-8', newline='') as f:
                 writer = csv.writer(f)
                 writer.writerow(["Timestamp", "Message", "Summary"])
         self.load_conversation_from_csv()
         self.start_watching_file()
+        self.schedule_compaction()
 
     def load_conversation_from_csv(self):
-        current_modified_time = os.path.getmtime(self.conversation_csv_path)
-        if self.last_modified_time is None or self.last_modified_time < current_modified_time:
-            self.last_modified_time = current_modified_time
-            self.context = []
-            self.unique_entries = set()
-            if os.path.exists(self.conversation_csv_path):
-                with open(self.conversation_csv_path, "r", encoding='utf-8', newline='') as f:
-                    reader = csv.reader(f)
-                    next(reader)  # Skip header row
-                    for row in reader:
-                        timestamp = row[0]
-                        message = row[1]
-                        summary = row[2]
-                        entry_key = (timestamp, message)
-                        if entry_key not in self.unique_entries:
-                            self.unique_entries.add(entry_key)
-                            self.context.append((timestamp, message, summary))
+        """
+        Parse only the rows appended since the last call, starting at the saved byte offset.
+        The file is read from the start again only if it was replaced or truncated.
+        """
+        with self.lock:
+            if not os.path.exists(self.conversation_csv_path):
+                return
+            with open(self.conversation_csv_path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                file_id = (stat.st_dev, stat.st_ino)
+                if file_id != self.file_id or stat.st_size < self.read_offset:
+                    # Rewritten by someone else: start over
+                    self.file_id = file_id
+                    self.read_offset = 0
+                    self.context = []
+                    self.unique_entries = set()
+                if stat.st_size == self.read_offset:
+                    return
+                f.seek(self.read_offset)
+                data = f.read()
+
+            # Cut on the bytes, so the offset advances by exactly what was read even if
+            # decoding has to replace invalid bytes
+            records = complete_records(data)
+            if not records:
+                return
+            reader = csv.reader(io.StringIO(records.decode('utf-8', errors='replace'), newline=''))
+            if self.read_offset == 0:
+                next(reader, None)  # Skip header row
+            for row in reader:
+                # Rows appended by other writers need compacting as much as our own
+                self.rows_since_compaction += 1
+                if len(row) < 3:
+                    continue
+                timestamp = row[0]
+                message = row[1]
+                summary = row[2]
+                entry_key = (timestamp, message)
+                if entry_key not in self.unique_entries:
+                    self.unique_entries.add(entry_key)
+                    self.context.append((timestamp, message, summary))
+            self.read_offset += len(records)
 
     def append_to_conversation(self, user_query, ai_response=None, timestamp=None):
         if not timestamp:
@@ -85,16 +143,12 @@ class ConversationManager:
         summary_prompt = f"Summarize the following message in 50 words or less:\n\n{message}"
         
         try:
-            completion = self.client.chat.completions.create(
+            completion = self.client.chat_completion(
                 model=self.MODEL_NAME,
                 messages=[
                     {"role": "system", "content": "You are an AI assistant tasked with summarizing messages."},
                     {"role": "user", "content": summary_prompt}
                 ],
-                extra_headers={
-                    "HTTP-Referer": "your_site_url",  # Replace with your site URL
-                    "X-Title": "your_app_name",       # Replace with your app name
-                }
             )
             if completion.choices and completion.choices[0].message:
                 return completion.choices[0].message.content.strip()
@@ -126,13 +180,9 @@ class ConversationManager:
                 conversation_history.append({"role": "user", "content": user_part})
 
         try:
-            completion = self.client.chat.completions.create(
+            completion = self.client.chat_completion(
                 model=self.MODEL_NAME,
                 messages=conversation_history,
-                extra_headers={
-                    "HTTP-Referer": "your_site_url",  # Replace with your site URL
-                    "X-Title": "your_app_name",       # Replace with your app name
-                }
             )
             if completion.choices and completion.choices[0].message:
                 response_message = completion.choices[0].message.content
@@ -146,10 +196,43 @@ class ConversationManager:
             return None
 
     def process_new_messages(self):
+        # Events caused by our own writes find nothing past the offset and cost one stat
         self.load_conversation_from_csv()
-        self.cleanup_csv()
+
+    def schedule_compaction(self):
+        """
+        Run cleanup_csv every compaction_interval seconds on a timer thread,
+        instead of after every modification.
+        """
+        with self.lock:
+            self.compaction_stopped = False
+            self._schedule_next_compaction()
+
+    def _schedule_next_compaction(self):
+        if self.compaction_timer:
+            self.compaction_timer.cancel()
+        if not self.compaction_interval:
+            return
+        self.compaction_timer = threading.Timer(self.compaction_interval, self._run_scheduled_compaction)
+        self.compaction_timer.daemon = True
+        self.compaction_timer.start()
+
+    def _run_scheduled_compaction(self):
+        try:
+            if self.rows_since_compaction:
+                self.cleanup_csv()
+        except Exception as e:
+            print(f"Error compacting conversation CSV: {str(e)}")
+        with self.lock:
+            # A timer that fired while stop_watching_file ran must not start a new one
+            if not self.compaction_stopped:
+                self._schedule_next_compaction()
 
     def cleanup_csv(self):
+        with self.lock:
+            self._compact_csv()
+
+    def _compact_csv(self):
         # Create a temporary file to store valid rows
         temp_csv_path = self.conversation_csv_path + ".tmp"
         with open(self.conversation_csv_path, "r", encoding='utf-8', newline='') as f_in, open(temp_csv_path, "w", encoding='utf-8', newline='') as f_out:
@@ -171,11 +254,14 @@ class ConversationManager:
                     if message.strip().startswith("User: "):
                         pass  # Skip this row as it's incomplete
 
-        # Replace the original file with the temp file
+        # Replace the original file with the temp file; the reader starts over on the new file
         os.replace(temp_csv_path, self.conversation_csv_path)
         self.load_conversation_from_csv()
+        # Re-reading the compacted rows is not new data
+        self.rows_since_compaction = 0
 
     def clear_conversation(self):
+        self.stop_watching_file()
         if self.conv_folder:
             for root, dirs, files in os.walk(self.conv_folder, topdown=False):
                 for name in files:
@@ -198,12 +284,11 @@ class ConversationManager:
 
     def update_client(self):
         if self.MODEL_NAME and self.OPEN_ROUTER_API_KEY:
-            self.client = Client(
-                base_url="https://openrouter.ai/api/v1",
-                api_key=self.OPEN_ROUTER_API_KEY,
-            )
+            self.client = get_openrouter_client()
+            self.client.set_api_key(self.OPEN_ROUTER_API_KEY)
 
     def start_watching_file(self):
+        self.stop_watching_file()
         if self.conversation_csv_path:
             event_handler = ConversationEventHandler(self)
             self.observer = Observer()
@@ -211,14 +296,30 @@ class ConversationManager:
             self.observer.start()
 
     def stop_watching_file(self):
+        # Taking the lock also waits for a compaction in progress
+        with self.lock:
+            self.compaction_stopped = True
+            if self.compaction_timer:
+                self.compaction_timer.cancel()
+                self.compaction_timer = None
         if self.observer:
             self.observer.stop()
             self.observer.join()
+            self.observer = None
 
     def save_conversation_to_csv(self, combined_message, summary, timestamp):
-        with open(self.conversation_csv_path, "a", encoding='utf-8', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([timestamp, combined_message, summary])
+        with self.lock:
+            # Catch up first, so our own row is the only unread data and can be skipped
+            self.load_conversation_from_csv()
+            with open(self.conversation_csv_path, "a", encoding='utf-8', newline='') as f:
+                start = f.tell()
+                writer = csv.writer(f)
+                writer.writerow([timestamp, combined_message, summary])
+                f.flush()
+                if start == self.read_offset:
+                    # The row is already in the context; the modification event will find nothing new
+                    self.read_offset = f.tell()
+            self.rows_since_compaction += 1
 
 # Define the conversation manager instance
 conversation_manager = ConversationManager()
@@ -0,0 +1,148 @@
+import time
+import queue
+import threading
+import logging
+from .memory_handler import tokenize
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Put on the queue to wake the worker without adding a chunk
+WAKE = object()
+# How long stop waits for the worker when the queued chunks are dropped; a batch that is
+# still training then finishes in the background and is thrown away
+STOP_TIMEOUT_SECONDS = 0.1
+
+class BackgroundTrainer:
+    def __init__(self, memory_handler, batch_size=32, max_wait_seconds=30.0):
+        """
+        Retrain a MemoryHandler's Word2Vec model on a background thread.
+
+        Chunks are queued and trained in batches once batch_size chunks are waiting or the
+        oldest waiting chunk is max_wait_seconds old. Training runs on a copy of the model,
+        which is then swapped in, so embedding lookups never wait for training.
+        """
+        self.memory_handler = memory_handler
+        self.batch_size = batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.pending = queue.Queue()
+        self.last_training_seconds = None
+        self.trainings = 0
+        self.stopped = threading.Event()
+        self.discarded = threading.Event()  # Stopped without a flush: train nothing more, save nothing
+        self.save_lock = threading.Lock()
+        self.flush_requested = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="word2vec-trainer", daemon=True)
+        self.thread.start()
+
+    @property
+    def queue_depth(self):
+        """
+        Number of chunks waiting to be trained on.
+        """
+        return self.pending.qsize()
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "trainings": self.trainings,
+            "last_training_seconds": self.last_training_seconds,
+        }
+
+    def enqueue(self, chunks):
+        """
+        Queue chunks for the next training batch.
+        """
+        for chunk in chunks:
+            self.pending.put(chunk)
+
+    def flush(self):
+        """
+        Train on everything queued so far without waiting for the batch triggers.
+        """
+        self.flush_requested.set()
+        self.pending.put(WAKE)
+
+    def stop(self, flush=True):
+        """
+        Stop the worker, optionally training on the remaining chunks first.
+
+        With flush, this waits until the remaining chunks are trained and saved. Without it,
+        it returns within STOP_TIMEOUT_SECONDS (or once a save already in progress is done),
+        and the worker never saves again, so the model's folder can be removed right away.
+        """
+        if flush:
+            self.flush()
+        else:
+            self.discarded.set()
+            # Drop whatever is still queued
+            while not self.pending.empty():
+                try:
+                    self.pending.get_nowait()
+                except queue.Empty:
+                    break
+        self.stopped.set()
+        self.pending.put(WAKE)
+        if flush:
+            self.thread.join()
+            return
+        # Let a save already in progress finish; later ones see discarded and are skipped
+        with self.save_lock:
+            pass
+        self.thread.join(STOP_TIMEOUT_SECONDS)
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch:
+                self._train(batch)
+            elif self.stopped.is_set():
+                break
+
+    def _collect_batch(self):
+        """
+        Block until the size or time trigger fires (or a flush or stop is requested),
+        then return the queued chunks.
+        """
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            if self.flush_requested.is_set() or self.stopped.is_set():
+                if self.pending.empty():
+                    self.flush_requested.clear()
+                    break
+            elif deadline is not None and time.monotonic() >= deadline:
+                break
+            timeout = 0.5 if deadline is None else min(0.5, max(0.0, deadline - time.monotonic()))
+            try:
+                chunk = self.pending.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if chunk is WAKE:
+                continue
+            batch.append(chunk)
+            if deadline is None:
+                deadline = time.monotonic() + self.max_wait_seconds
+        return batch
+
+    def _train(self, chunks):
+        """
+        Train a new overlay model on the batch, save it and swap it in.
+        """
+        sentences = [words for words in (tokenize(chunk) for chunk in chunks) if words]
+        if not sentences or self.discarded.is_set():
+            return
+        start = time.perf_counter()
+        try:
+            model = self.memory_handler.build_trained_model(sentences)
+            with self.save_lock:
+                if self.discarded.is_set():
+                    logging.info("Word2Vec trainer was stopped; discarding the batch it was training.")
+                    return
+                self.memory_handler.save_model(model)
+            self.memory_handler.swap_model(model)
+            self.trainings += 1
+            self.last_training_seconds = time.perf_counter() - start
+            logging.info(f"Word2Vec model retrained on {len(sentences)} chunks in {self.last_training_seconds:.2f}s.")
+        except Exception as e:
+            logging.error(f"Error retraining Word2Vec model: {str(e)}")
\ No newline at end of file
@@ -1,41 +1,73 @@
+import sys
+from startup_profiler import StartupProfiler
+
+# Started before the other imports so that they are timed with --profile-startup
+profiler = StartupProfiler(enabled="--profile-startup" in sys.argv)
+profiler.install()
+
 import customtkinter as ctk
 from gui.app import run_gui_wrapper
-from brain.ai_memory import conversation_manager
+from brain.ai_memory import get_conversation_manager
 from brain.agenticreason import AgenticReasoner
 from config import OPEN_ROUTER_API_KEY, MODEL_NAME
 
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
 
-# Set the OpenRouter API key and model name
-conversation_manager.set_openrouter_api_key(OPEN_ROUTER_API_KEY)
-conversation_manager.set_model_name(MODEL_NAME)
+agentic_reasoner = None
 
-agentic_reasoner = AgenticReasoner(api_key=OPEN_ROUTER_API_KEY, model_name=MODEL_NAME)
+def get_agentic_reasoner():
+    """
+    Return the AgenticReasoner, creating it on first use around the shared ConversationManager.
+    """
+    global agentic_reasoner
+    if agentic_reasoner is None:
+        agentic_reasoner = AgenticReasoner(
+            api_key=OPEN_ROUTER_API_KEY,
+            model_name=MODEL_NAME,
+            conversation_manager=get_conversation_manager(),
+        )
+    return agentic_reasoner
+
+def on_window_ready(conversation_manager):
+    profiler.finish()
+    # Load the word vectors and API client in the background now that the window is up
+    if conversation_manager.config.get("PRELOAD_AFTER_STARTUP", True):
+        conversation_manager.preload_in_background()
+    conversation_manager.start_folder_watcher()
 
 def run_engine():
-    root = ctk.CTk()
-    root.title("Odin")
+    with profiler.section("ConversationManager"):
+        conversation_manager = get_conversation_manager()
+        # Set the OpenRouter API key and model name
+        conversation_manager.set_openrouter_api_key(OPEN_ROUTER_API_KEY)
+        conversation_manager.set_model_name(MODEL_NAME)
+
+    with profiler.section("Main window"):
+        root = ctk.CTk()
+        root.title("Odin")
 
-    screen_width = root.winfo_screenwidth()
-    screen_height = root.winfo_screenheight()
+        screen_width = root.winfo_screenwidth()
+        screen_height = root.winfo_screenheight()
 
-    window_width = int(screen_width * 0.25)
-    window_height = int(screen_height * 0.85)
+        window_width = int(screen_width * 0.25)
+        window_height = int(screen_height * 0.85)
 
-    window_x = (screen_width - window_width) // 2
-    window_y = (screen_height - window_height) // 2
+        window_x = (screen_width - window_width) // 2
+        window_y = (screen_height - window_height) // 2
 
-    root.geometry(f"{window_width}x{window_height}+{window_x}+{window_y}")
-    root.configure(fg_color="#000000")
+        root.geometry(f"{window_width}x{window_height}+{window_x}+{window_y}")
+        root.configure(fg_color="#000000")
 
-    container = ctk.CTkFrame(root, fg_color="#000000", border_width=0)
-    container.pack(padx=20, pady=20, fill=ctk.BOTH, expand=True)
+        container = ctk.CTkFrame(root, fg_color="#000000", border_width=0)
+        container.pack(padx=20, pady=20, fill=ctk.BOTH, expand=True)
 
-    # Pass the ChatbotUI instance to the ConversationManager
-    chatbot_ui = run_gui_wrapper(container)
-    conversation_manager.chatbot_ui = chatbot_ui  # Ensure this line is present
+    with profiler.section("ChatbotUI"):
+        # Pass the ChatbotUI instance to the ConversationManager
+        chatbot_ui = run_gui_wrapper(container)
+        conversation_manager.chatbot_ui = chatbot_ui  # Ensure this line is present
 
+    root.after_idle(on_window_ready, conversation_manager)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@ import tkinter as tk  # Add this import statement
 import tkinter.filedialog as filedialog
 import pyperclip
 import sys
+from .message_parser import MessageParser
 
 class CustomText(tk.Text):
     def __init__(self, master=None, **kw):
@@ -73,6 +74,17 @@ class CustomText(tk.Text):
             spacing3=10
         )
 
+        # Transcript mode: only a window of recent turns stays resident in the widget
+        self.max_resident_lines = None
+        self.history_loader = None
+        self.history_page_size = 20
+        self.turn_marks = []  # One mark per resident turn, oldest first
+        self.turn_row_ids = {}  # Turn mark -> id of its saved row; unsaved turns have none
+        self.turn_counter = 0
+        self.has_hidden_history = False  # Older saved turns may exist above the resident window
+        self.hidden_before_id = None  # Row id above which every evicted turn lies
+        self.loading_history = False
+
         self.tag_bind("buttons", "<Button-1>", self.handle_button_click)
         self.tag_bind("buttons", "<Enter>", self.on_button_enter)
         self.tag_bind("buttons", "<Leave>", self.on_button_leave)
@@ -185,6 +197,145 @@ class CustomText(tk.Text):
         self.insert('end', "[Copy] [Save]\n", ("buttons",))
         self.mark_set("insert", "end-2c")
 
+    def enable_transcript(self, history_loader, max_resident_lines=2000, page_size=20):
+        """
+        Keep at most max_resident_lines lines in the widget, evicting the oldest turns.
+        Evicted turns are loaded back on demand through history_loader(before_id, limit),
+        which returns the saved (id, "User: ...\nAI: ...") rows preceding row before_id in
+        chronological order.
+        """
+        self.history_loader = history_loader
+        self.max_resident_lines = max_resident_lines
+        self.history_page_size = page_size
+
+    def reset_transcript(self):
+        """
+        Forget all turn bookkeeping, e.g. after the widget has been cleared.
+        """
+        for mark in self.turn_marks:
+            self.mark_unset(mark)
+        self.turn_marks = []
+        self.turn_row_ids = {}
+        self.has_hidden_history = False
+        self.hidden_before_id = None
+
+    def begin_turn(self):
+        """
+        Mark the start of a new turn at the end of the transcript and return the mark.
+        """
+        mark = self._new_turn_mark()
+        self.mark_set(mark, "end-1c")
+        self.mark_gravity(mark, "left")
+        self.turn_marks.append(mark)
+        return mark
+
+    def set_turn_row_id(self, mark, row_id):
+        """
+        Record the id of the row saved for a turn. Only updates a dict, so a worker thread
+        may call it.
+        """
+        self.turn_row_ids[mark] = row_id
+
+    def resident_line_count(self):
+        return int(self.index("end-1c").split(".")[0])
+
+    def trim_transcript(self):
+        """
+        Evict the oldest turns until the resident line count is within the cap.
+        The most recent turn is never evicted.
+        """
+        if not self.max_resident_lines:
+            return
+        while len(self.turn_marks) > 1 and self.resident_line_count() > self.max_resident_lines:
+            self.delete("1.0", self.turn_marks[1])
+            mark = self.turn_marks.pop(0)
+            self.mark_unset(mark)
+            row_id = self.turn_row_ids.pop(mark, None)
+            if row_id is not None:
+                self.hidden_before_id = max(self.hidden_before_id or 0, row_id + 1)
+            self.has_hidden_history = True
+
+    def on_yscroll(self, first, last):
+        """
+        Load older turns when the view reaches the top of the resident window.
+        """
+        if float(first) <= 0.0 and self.has_hidden_history and self.history_loader and not self.loading_history:
+            self.loading_history = True
+            self.after_idle(self.load_older_turns)
+
+    def load_older_turns(self):
+        """
+        Insert the page of saved turns preceding the oldest resident turn.
+
+        Pages are keyed by row id rather than by counting turns, since a turn in the window
+        may have no saved row (e.g. a cancelled request) and rows may be saved without being
+        shown (e.g. files ingested from a watched folder).
+        """
+        try:
+            rows = self.history_loader(self._history_boundary(), self.history_page_size)
+            if len(rows) < self.history_page_size:
+                self.has_hidden_history = False
+            if not rows:
+                return
+            messages = [message for _, message in rows]
+
+            previous_first = self.turn_marks[0] if self.turn_marks else None
+            turn_segments = [self._history_segments(message) for message in messages]
+            segments = [part for parts in turn_segments for part in parts]
+
+            state = self.cget("state")
+            self.configure(state="normal")
+            if previous_first:
+                # Let the old first turn mark move past the inserted text
+                self.mark_gravity(previous_first, "right")
+            self.insert("1.0", *segments)
+            if previous_first:
+                self.mark_gravity(previous_first, "left")
+            self.configure(state=state)
+
+            # Add marks for the loaded turns, newest first so each lands at the front
+            starts = []
+            line = 1
+            for parts in turn_segments:
+                starts.append(f"{line}.0")
+                line += sum(text.count("\n") for text in parts[0::2])
+            for start, (row_id, _) in reversed(list(zip(starts, rows))):
+                mark = self._new_turn_mark()
+                self.mark_set(mark, start)
+                self.mark_gravity(mark, "left")
+                self.turn_marks.insert(0, mark)
+                self.turn_row_ids[mark] = row_id
+
+            if previous_first:
+                self.yview(previous_first)
+        finally:
+            self.loading_history = False
+
+    def _history_boundary(self):
+        """
+        Return the row id the next page of history ends before: the oldest saved resident
+        turn, or past the newest evicted one if no resident turn has been saved.
+        """
+        row_ids = [self.turn_row_ids[mark] for mark in self.turn_marks if mark in self.turn_row_ids]
+        return min(row_ids) if row_ids else self.hidden_before_id
+
+    def _new_turn_mark(self):
+        self.turn_counter += 1
+        return f"turn_{self.turn_counter}"
+
+    def _history_segments(self, message):
+        """
+        Convert a saved message into alternating text/tags arguments for Text.insert.
+        """
+        user_part, _, ai_part = message.partition("\nAI: ")
+        segments = [f"{user_part.strip()}\n", "user"]
+        for parsed in MessageParser().parse_response(ai_part):
+            if parsed["type"] == "code":
+                segments.extend([f"{parsed['content']}\n", "code", "[Copy] [Save]\n", "buttons"])
+            else:
+                segments.extend([f"{parsed['content']}\n", "assistant"])
+        return segments
+
     def on_button_enter(self, event):
         self.config(cursor="hand2")
 
@@ -92,16 +92,27 @@ class ChatbotButtons:
         self.clear_memories_button.pack(side=ctk.LEFT, padx=10, pady=10)
 
     def new_conversation(self):
+        # Cancel any running request before its conversation is removed
+        self.chatbot_ui.stop_current_streaming()
         self.chatbot_ui.conversation_manager.clear_conversation(new_conversation=True)
         self.chatbot_ui.clear_chat(new_conversation=True)
 
     def clear_chat(self):
+        self.chatbot_ui.stop_current_streaming()
         self.chatbot_ui.conversation_manager.clear_conversation(new_conversation=False)
         self.chatbot_ui.clear_chat(new_conversation=False)
 
     def clear_memories(self):
         memory_dir = self.chatbot_ui.conversation_manager.memory_dir
         if os.path.exists(memory_dir):
+            self.chatbot_ui.stop_current_streaming()
+            conversation_manager = self.chatbot_ui.conversation_manager
+            conversation_manager.release_conversation()
+            # Cached uploads and answers would bring cleared memories back
+            if conversation_manager.ingestion_cache is not None:
+                conversation_manager.ingestion_cache.clear()
+            if conversation_manager.response_cache is not None:
+                conversation_manager.response_cache.clear()
             for folder in os.listdir(memory_dir):
                 folder_path = os.path.join(memory_dir, folder)
                 if os.path.isdir(folder_path):
@@ -129,6 +140,5 @@ class ChatbotButtons:
             self.chatbot_ui.widgets['text_box'].yview('end')
 
     def pick_file(self):
-        self.chatbot_ui.conversation_manager.pick_file()
-        self.chatbot_ui.clear_chat(new_conversation=False)
+        self.chatbot_ui.upload_file()
 # END OF FILE: C:\Users\Sean Craig\Desktop\AI Python Tools\Odin\gui\chatbot_buttons.py
\ No newline at end of file
@@ -1,10 +1,15 @@
+import os
 import customtkinter as ctk
-from brain.ai_memory import conversation_manager
+from tkinter import filedialog
+from brain.ai_memory import get_conversation_manager
+from brain.cancellation import CancelToken
+import time
 import threading
 import queue
 import logging
 from .CustomText import CustomText
-from .stream_response import stream_response
+from .stream_response import stream_response, upload_document
+from .response_drain import ResponseDrainer
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -12,7 +17,7 @@ logging.basicConfig(level=logging.DEBUG)
 class ChatbotUI:
     def __init__(self, master):
         self.master = master
-        self.conversation_manager = conversation_manager
+        self.conversation_manager = get_conversation_manager()
         self.widgets = {
             'text_box': None,
             'scrollbar': None,
@@ -21,10 +26,11 @@ class ChatbotUI:
             'text_frame': None,
             'entry_frame': None,
         }
-        self.response_queue = queue.Queue()
-        self.stop_streaming = False
+        self.response_queue = queue.Queue()  # Replaced for every request, so late output from a cancelled one is dropped
+        self.cancel_token = None
         self.streaming_thread = None
         self.lock = threading.Lock()
+        self.response_drainer = ResponseDrainer(self)
         self.create_widgets()
 
         # Ensure the conversation_manager has a reference to this ChatbotUI instance
@@ -53,7 +59,19 @@ class ChatbotUI:
 
         self.widgets['scrollbar'] = ctk.CTkScrollbar(self.widgets['text_frame'])
         self.widgets['scrollbar'].grid(row=0, column=1, sticky="ns")
-        self.widgets['text_box'].configure(yscrollcommand=self.widgets['scrollbar'].set)
+        self.widgets['text_box'].configure(yscrollcommand=self.on_text_scroll)
+
+        config = self.conversation_manager.config
+        if config.get("TRANSCRIPT_MODE", True):
+            self.widgets['text_box'].enable_transcript(
+                self.conversation_manager.get_conversation_page,
+                max_resident_lines=config.get("TRANSCRIPT_MAX_LINES", 2000),
+                page_size=config.get("TRANSCRIPT_PAGE_SIZE", 20),
+            )
+
+    def on_text_scroll(self, first, last):
+        self.widgets['scrollbar'].set(first, last)
+        self.widgets['text_box'].on_yscroll(first, last)
 
     def initialize_entry_frame(self):
         self.widgets['entry_frame'] = ctk.CTkFrame(self.master)
@@ -77,68 +95,114 @@ class ChatbotUI:
                 self.widgets['entry'].delete("1.0", "end")
 
     def send_message(self, user_message):
-        self.stop_streaming = True
-        if self.streaming_thread and self.streaming_thread.is_alive():
-            self.streaming_thread.join()
-        self.stop_streaming = False
-        self.display_user_message(user_message)
-        with self.response_queue.mutex:
-            self.response_queue.queue.clear()
-        self.streaming_thread = threading.Thread(target=stream_response, args=(self, user_message))
+        self.cancel_current_request()
+        turn = self.display_user_message(user_message)
+        self.start_worker(stream_response, user_message, self.turn_saved_callback(turn))
+
+    def upload_file(self):
+        """
+        Ask for a file and summarize it in the background, showing progress in the chat.
+        """
+        file_path = filedialog.askopenfilename(parent=self.master, title="Select a file to upload")
+        if not file_path:
+            return
+        self.cancel_current_request()
+        turn = self.display_user_message(f"Uploaded file: {os.path.basename(file_path)}")
+        self.start_worker(upload_document, file_path, self.turn_saved_callback(turn))
+
+    def turn_saved_callback(self, turn):
+        """
+        Return a callable for the worker that records the row id saved for a turn.
+        """
+        text_box = self.widgets['text_box']
+        return lambda row_id: text_box.set_turn_row_id(turn, row_id)
+
+    def start_worker(self, target, *args):
+        """
+        Run target(self, *args, response_queue, cancel_token) on a worker thread and render
+        what it puts on the response queue.
+        """
+        self.cancel_token = CancelToken()
+        self.streaming_thread = threading.Thread(
+            target=target,
+            args=(self, *args, self.response_queue, self.cancel_token),
+            daemon=True,
+        )
         self.streaming_thread.start()
-        self.master.after(100, self.check_response_queue)
-
-    def check_response_queue(self):
-        try:
-            response = self.response_queue.get(block=False)
-            if response is None:
-                self.display_response({"type": "text", "content": ""}, end_with_newline=True)
-            else:
-                if not self.stop_streaming:
-                    self.display_response(response, end_with_newline=False)
-            self.master.after(100, self.check_response_queue)
-        except queue.Empty:
-            self.master.after(100, self.check_response_queue)
+        self.response_drainer.start()
+
+    def cancel_current_request(self):
+        """
+        Cancel the in-flight request without waiting for its worker thread.
+        The worker aborts in the background and whatever it still produces is discarded.
+        """
+        if self.cancel_token is not None and self.streaming_thread and self.streaming_thread.is_alive():
+            start = time.perf_counter()
+            self.cancel_token.cancel()
+            logging.info(f"Cancelled the current request; UI thread released after {(time.perf_counter() - start) * 1000:.2f} ms.")
+        self.cancel_token = None
+        self.streaming_thread = None
+        self.response_queue = queue.Queue()
 
     def display_user_message(self, user_message):
+        """
+        Show the user's message as the start of a new turn and return the turn's mark.
+        """
         with self.lock:
             self.widgets['text_box'].configure(state="normal")
+            turn = self.widgets['text_box'].begin_turn()
             self.widgets['text_box'].insert('end', f"User: {user_message}\n", "user")
+            self.widgets['text_box'].trim_transcript()
             self.widgets['text_box'].configure(state="disabled")
             self.widgets['text_box'].yview('end')
+        return turn
 
     def display_response(self, response, end_with_newline=False):
+        self.display_responses([response])
+
+    def display_responses(self, responses):
+        """
+        Render a batch of parsed messages with a single widget update.
+        Consecutive text messages are merged into one insert.
+        """
+        text_box = self.widgets['text_box']
         with self.lock:
-            self.widgets['text_box'].configure(state="normal")
-            if response["type"] == "text":
-                content = response['content'].strip()
-                if content:  # Only display non-empty content
-                    self.widgets['text_box'].insert('end', f"{content}\n", "assistant")
-            elif response["type"] == "code":
-                content = response['content'].strip()
-                if content:  # Only display non-empty content
-                    # Insert code with buttons
-                    self.widgets['text_box'].insert_code(content, language=response['language'])
-            elif response["type"] == "buttons":
-                self.widgets['text_box'].insert('end', f"{response['content']}\n", "buttons")
-            self.widgets['text_box'].configure(state="disabled")
-            self.widgets['text_box'].yview('end')
+            text_box.configure(state="normal")
+            pending_text = []
+            for response in responses:
+                if response["type"] == "text":
+                    content = response['content'].strip()
+                    if content:  # Only display non-empty content
+                        pending_text.append(f"{content}\n")
+                    continue
+                if pending_text:
+                    text_box.insert('end', "".join(pending_text), "assistant")
+                    pending_text = []
+                if response["type"] == "code":
+                    content = response['content'].strip()
+                    if content:  # Only display non-empty content
+                        # Insert code with buttons
+                        text_box.insert_code(content, language=response['language'])
+                elif response["type"] == "buttons":
+                    text_box.insert('end', f"{response['content']}\n", "buttons")
+            if pending_text:
+                text_box.insert('end', "".join(pending_text), "assistant")
+            text_box.trim_transcript()
+            text_box.configure(state="disabled")
+            text_box.yview('end')
 
     def clear_chat(self, new_conversation=False):
         """
         Clear the chat history in the UI.
         """
-        self.stop_streaming = True
-        if self.streaming_thread and self.streaming_thread.is_alive():
-            self.streaming_thread.join()
-        with self.response_queue.mutex:
-            self.response_queue.queue.clear()
+        self.cancel_current_request()
+        self.response_drainer.stop()
         self.widgets['text_box'].configure(state="normal")
         self.widgets['text_box'].delete(1.0, "end")
+        self.widgets['text_box'].reset_transcript()
         self.widgets['text_box'].configure(state="disabled")
         self.widgets['entry'].delete("1.0", "end")
 
     def stop_current_streaming(self):
-        self.stop_streaming = True
-        if self.streaming_thread and self.streaming_thread.is_alive():
-            self.streaming_thread.join()
\ No newline at end of file
+        self.cancel_current_request()
+        self.response_drainer.stop()
\ No newline at end of file
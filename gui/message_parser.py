@@ -16,48 +16,98 @@ class MessageParser:
         """
         Initialize the MessageParser with the global configuration variables.
         """
-        self.buffer = ""
+        self.partial_line = []  # Pieces of the current line that has not been terminated yet
         self.in_code_block = False
         self.code_language = None
         self.code_block = []
 
     def parse_response(self, response):
+        """
+        Parse a complete response string into text and code messages.
+        """
+        parsed_messages = self.feed(response)
+        parsed_messages.extend(self.flush())
+        return parsed_messages
+
+    def feed(self, chunk):
+        """
+        Feed a chunk of a streamed response into the parser.
+
+        Only the new chunk is scanned; partial lines and code block state are kept
+        between calls, so a fence or line split across chunks is handled correctly.
+
+        Returns:
+            list: The text and code messages completed by this chunk.
+        """
         parsed_messages = []
-        # Split the response into lines
-        lines = response.split('\n')
-        for line in lines:
-            if line.strip().startswith('```'):
-                # Toggle code block state
-                if self.in_code_block:
-                    # End of code block
-                    code_content = self._build_code_block_content()
-                    if code_content:
-                        parsed_messages.append({
-                            "type": "code",
-                            "content": code_content,
-                            "language": self.code_language
-                        })
-                    self.in_code_block = False
-                    self.code_language = None
-                    self.code_block = []
-                else:
-                    # Start of code block
-                    self.in_code_block = True
-                    # Extract language if present
-                    lang_part = line.strip().lstrip('```')
-                    self.code_language = lang_part if lang_part else None
-            elif self.in_code_block:
-                # Add line to the current code block
-                self.code_block.append(line)
-            else:
-                # Add text line
-                if line.strip():
-                    parsed_messages.append({
-                        "type": "text",
-                        "content": line.strip()
-                    })
+        start = 0
+        newline = chunk.find('\n')
+        while newline != -1:
+            self.partial_line.append(chunk[start:newline])
+            line = "".join(self.partial_line)
+            self.partial_line = []
+            self._parse_line(line, parsed_messages)
+            start = newline + 1
+            newline = chunk.find('\n', start)
+        if start < len(chunk):
+            self.partial_line.append(chunk[start:])
         return parsed_messages
 
+    def flush(self):
+        """
+        Emit whatever is still buffered once the stream has ended and reset the parser.
+
+        Returns:
+            list: The remaining text and code messages.
+        """
+        parsed_messages = []
+        if self.partial_line:
+            line = "".join(self.partial_line)
+            self.partial_line = []
+            self._parse_line(line, parsed_messages)
+        if self.in_code_block:
+            # The response ended inside an unterminated code block
+            self._close_code_block(parsed_messages)
+        return parsed_messages
+
+    def _parse_line(self, line, parsed_messages):
+        """
+        Parse a single complete line, appending any finished message to parsed_messages.
+        """
+        if line.strip().startswith('```'):
+            # Toggle code block state
+            if self.in_code_block:
+                # End of code block
+                self._close_code_block(parsed_messages)
+            else:
+                # Start of code block
+                self.in_code_block = True
+                # Extract language if present
+                lang_part = line.strip().lstrip('```')
+                self.code_language = lang_part if lang_part else None
+        elif self.in_code_block:
+            # Add line to the current code block
+            self.code_block.append(line)
+        else:
+            # Add text line
+            if line.strip():
+                parsed_messages.append({
+                    "type": "text",
+                    "content": line.strip()
+                })
+
+    def _close_code_block(self, parsed_messages):
+        code_content = self._build_code_block_content()
+        if code_content:
+            parsed_messages.append({
+                "type": "code",
+                "content": code_content,
+                "language": self.code_language
+            })
+        self.in_code_block = False
+        self.code_language = None
+        self.code_block = []
+
     def _build_code_block_content(self):
         """
         Build the code block content based on the selected options.
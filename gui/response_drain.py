@@ -0,0 +1,108 @@
+import queue
+import time
+import logging
+from collections import deque
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+class ResponseDrainer:
+    def __init__(self, chatbot_ui, min_interval_ms=16, max_interval_ms=250, timings_size=240):
+        """
+        Drain the ChatbotUI response queue on the Tk main loop.
+
+        Every tick takes all pending items and renders them in one pass. The drainer only
+        runs while a response is being streamed, and its interval shrinks while items keep
+        arriving and backs off while the queue is empty.
+        """
+        self.chatbot_ui = chatbot_ui
+        self.min_interval_ms = min_interval_ms
+        self.max_interval_ms = max_interval_ms
+        self.interval_ms = min_interval_ms
+        self.after_id = None
+        self.active = False
+        self.render_timings = deque(maxlen=timings_size)  # (items rendered, seconds) per frame
+
+    def start(self):
+        """
+        Start draining for a new response; does nothing if already running.
+        """
+        self.interval_ms = self.min_interval_ms
+        if not self.active:
+            self.active = True
+            self.after_id = self.chatbot_ui.master.after(0, self._tick)
+
+    def stop(self):
+        """
+        Stop draining and cancel the pending tick.
+        """
+        self.active = False
+        if self.after_id is not None:
+            try:
+                self.chatbot_ui.master.after_cancel(self.after_id)
+            except Exception:
+                pass
+            self.after_id = None
+
+    def _tick(self):
+        self.after_id = None
+        if not self.active:
+            return
+
+        items, finished = self._take_pending()
+        if items:
+            frame_start = time.perf_counter()
+            self.chatbot_ui.display_responses(items)
+            self.render_timings.append((len(items), time.perf_counter() - frame_start))
+
+        if finished:
+            self.active = False
+            logging.debug(f"Response drained: {self.frame_stats()}")
+            return
+
+        self._adjust_interval(len(items))
+        self.after_id = self.chatbot_ui.master.after(self.interval_ms, self._tick)
+
+    def _take_pending(self):
+        """
+        Take every item currently in the queue, stopping at the end-of-response marker.
+        """
+        items = []
+        finished = False
+        response_queue = self.chatbot_ui.response_queue
+        while True:
+            try:
+                item = response_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                finished = True
+                break
+            items.append(item)
+        return items, finished
+
+    def _adjust_interval(self, item_count):
+        """
+        Poll faster while items are arriving and back off exponentially while idle.
+        """
+        if item_count:
+            self.interval_ms = max(self.min_interval_ms, self.interval_ms // 2)
+        else:
+            self.interval_ms = min(self.max_interval_ms, self.interval_ms * 2)
+
+    def frame_stats(self):
+        """
+        Summarize recent render timings.
+
+        Returns:
+            dict: Frame count, items rendered, and mean/max frame time in milliseconds.
+        """
+        if not self.render_timings:
+            return {"frames": 0, "items": 0, "mean_ms": 0.0, "max_ms": 0.0}
+        durations = [seconds for _, seconds in self.render_timings]
+        return {
+            "frames": len(self.render_timings),
+            "items": sum(count for count, _ in self.render_timings),
+            "mean_ms": 1000 * sum(durations) / len(durations),
+            "max_ms": 1000 * max(durations),
+        }
\ No newline at end of file
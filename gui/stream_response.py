@@ -4,22 +4,32 @@ import logging
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def stream_response(chatbot_ui, user_message):
+def stream_response(chatbot_ui, user_message, on_saved, response_queue, cancel_token):
     """
     Stream the AI response to the GUI, ensuring code blocks are displayed simply with a black background.
+
+    Output goes to the response_queue of this request only; once cancel_token is cancelled
+    the UI has moved on to a new queue, so anything still produced here is discarded.
+    on_saved receives the row id of the saved turn.
     """
     try:
         # Process the user message and get the AI response
         if not hasattr(chatbot_ui.conversation_manager, 'process_query'):
             logging.error("ConversationManager does not have a 'process_query' method.")
-            chatbot_ui.response_queue.put({"type": "text", "content": "Error: ConversationManager is not properly initialized."})
-            chatbot_ui.response_queue.put(None)  # Signal end of response
+            response_queue.put({"type": "text", "content": "Error: ConversationManager is not properly initialized."})
+            response_queue.put(None)  # Signal end of response
+            return
+
+        if getattr(chatbot_ui.conversation_manager, 'stream_responses', False):
+            stream_deltas(chatbot_ui, user_message, on_saved, response_queue, cancel_token)
             return
 
-        response = chatbot_ui.conversation_manager.process_query(user_message)
+        response = chatbot_ui.conversation_manager.process_query(user_message, cancel_token=cancel_token, on_saved=on_saved)
+        if cancel_token.cancelled:
+            return
         if not response:
-            chatbot_ui.response_queue.put({"type": "text", "content": "Error: No response from the AI model."})
-            chatbot_ui.response_queue.put(None)  # Signal end of response
+            response_queue.put({"type": "text", "content": "Error: No response from the AI model."})
+            response_queue.put(None)  # Signal end of response
             return
 
         # Parse the response into messages
@@ -28,11 +38,57 @@ def stream_response(chatbot_ui, user_message):
 
         # Send parsed messages to the queue
         for message in parsed_messages:
-            chatbot_ui.response_queue.put(message)
+            response_queue.put(message)
 
-        chatbot_ui.response_queue.put(None)  # Signal end of response
+        response_queue.put(None)  # Signal end of response
 
     except Exception as e:
+        if cancel_token.cancelled:
+            return
         logging.error(f"Error in stream_response: {str(e)}")
-        chatbot_ui.response_queue.put({"type": "text", "content": f"Error: {str(e)}"})
-        chatbot_ui.response_queue.put(None)  # Signal end of response
\ No newline at end of file
+        response_queue.put({"type": "text", "content": f"Error: {str(e)}"})
+        response_queue.put(None)  # Signal end of response
+
+def upload_document(chatbot_ui, file_path, on_saved, response_queue, cancel_token):
+    """
+    Summarize an uploaded file on the worker thread, reporting progress in the chat window
+    and finishing with the document summary.
+    """
+    def progress(message):
+        if not cancel_token.cancelled:
+            response_queue.put({"type": "text", "content": message})
+
+    try:
+        summary = chatbot_ui.conversation_manager.file_picker.process_file(
+            file_path, progress=progress, cancel_token=cancel_token, on_saved=on_saved,
+        )
+        if cancel_token.cancelled:
+            return
+        for message in MessageParser().parse_response(summary):
+            response_queue.put(message)
+    except Exception as e:
+        if cancel_token.cancelled:
+            return
+        logging.error(f"Error processing file: {str(e)}")
+        response_queue.put({"type": "text", "content": f"Error processing file: {str(e)}"})
+    response_queue.put(None)  # Signal end of response
+
+def stream_deltas(chatbot_ui, user_message, on_saved, response_queue, cancel_token):
+    """
+    Feed text deltas through an incremental parser and send each completed line or
+    code block to the GUI as soon as it is available.
+    """
+    parser = MessageParser()
+    received_any = False
+    for delta in chatbot_ui.conversation_manager.process_query_stream(user_message, cancel_token, on_saved=on_saved):
+        received_any = True
+        for message in parser.feed(delta):
+            response_queue.put(message)
+    if cancel_token.cancelled:
+        return
+
+    for message in parser.flush():
+        response_queue.put(message)
+    if not received_any:
+        response_queue.put({"type": "text", "content": "Error: No response from the AI model."})
+    response_queue.put(None)  # Signal end of response
\ No newline at end of file
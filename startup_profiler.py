@@ -0,0 +1,113 @@
+import sys
+import time
+import builtins
+import importlib.util
+import logging
+from contextlib import contextmanager
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+class StartupProfiler:
+    def __init__(self, enabled=False, top=25):
+        """
+        Measure where startup time goes: the time spent importing each module and the
+        time spent in named initialization sections, reported once the window is ready.
+
+        When disabled every method is a no-op, so the hooks can stay in the startup path.
+        """
+        self.enabled = enabled
+        self.top = top
+        self.start = time.perf_counter()
+        self.imports = {}  # module name -> [cumulative seconds, self seconds]
+        self.sections = []  # (name, seconds) in the order they ran
+        self.stack = []  # [module name, child seconds] for the imports in progress
+        self.original_import = None
+
+    def install(self):
+        """
+        Wrap builtins.__import__ so that first-time imports are timed.
+        """
+        if not self.enabled or self.original_import is not None:
+            return
+        self.original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def uninstall(self):
+        if self.original_import is not None:
+            builtins.__import__ = self.original_import
+            self.original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        try:
+            package = (globals or {}).get("__package__") if level else None
+            module_name = importlib.util.resolve_name("." * level + name, package) if level else name
+        except (ImportError, ValueError):
+            module_name = name
+        # Importing "a.b.c" loads any missing parent packages first, so the time is charged
+        # to the outermost module that is not loaded yet
+        parts = module_name.split(".")
+        module_name = next((".".join(parts[:i]) for i in range(1, len(parts) + 1) if ".".join(parts[:i]) not in sys.modules), None)
+        if module_name is None or any(entry[0] == module_name for entry in self.stack):
+            return self.original_import(name, globals, locals, fromlist, level)
+
+        self.stack.append([module_name, 0.0])
+        start = time.perf_counter()
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            _, child_seconds = self.stack.pop()
+            if self.stack:
+                self.stack[-1][1] += elapsed
+            timing = self.imports.setdefault(module_name, [0.0, 0.0])
+            timing[0] += elapsed
+            timing[1] += elapsed - child_seconds
+
+    @contextmanager
+    def section(self, name):
+        """
+        Time a named block of initialization work.
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections.append((name, time.perf_counter() - start))
+
+    def report(self):
+        """
+        Build the startup report: slowest imports by cumulative time, time per top-level
+        package, and the initialization sections.
+        """
+        total = time.perf_counter() - self.start
+        lines = [f"Startup profile: window ready after {total:.3f}s"]
+
+        lines.append(f"Slowest imports (cumulative / self, top {self.top}):")
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][0], reverse=True)[:self.top]
+        for module_name, (cumulative, own) in slowest:
+            lines.append(f"  {cumulative * 1000:9.1f} ms {own * 1000:9.1f} ms  {module_name}")
+
+        packages = {}
+        for module_name, (_, own) in self.imports.items():
+            package = module_name.split(".")[0]
+            packages[package] = packages.get(package, 0.0) + own
+        lines.append("Import time per top-level package:")
+        for package, seconds in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:self.top]:
+            lines.append(f"  {seconds * 1000:9.1f} ms  {package}")
+
+        lines.append("Initialization:")
+        for name, seconds in self.sections:
+            lines.append(f"  {seconds * 1000:9.1f} ms  {name}")
+        return "\n".join(lines)
+
+    def finish(self):
+        """
+        Stop timing imports and print the report.
+        """
+        if not self.enabled:
+            return
+        self.uninstall()
+        print(self.report(), flush=True)
\ No newline at end of file